@@ -1,76 +1,326 @@
 #!/usr/bin/python3.10
 
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
-from matplotlib.backends.backend_pdf import PdfPages
-
-from mini_pos import create_app
-from mini_pos.models import Order, db
-
-app = create_app()
+"""Create analysis.pdf from the completed orders.
+
+Importing this module has no side effects. pandas, matplotlib and pypdf are imported when they are needed, so the
+module can be imported without the analysis dependencies (e.g. to reuse the data extraction).
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import quote
+
+from sqlalchemy import create_engine, func, inspect, select
+from sqlalchemy.pool import StaticPool
+
+from mini_pos.log import CustomFormatter
+from mini_pos.migrations import MIGRATIONS, migrate
+from mini_pos.models import CatalogItem, Order, Product, Rollup
+from mini_pos.settings import Config
+
+logger = logging.getLogger("analyze")
 
 PDF_FILENAME = "analysis.pdf"
+CACHE_DIR = "analysis_cache"
+CACHE_VERSION = 2  # increment if the format of the cached data changes
 FIGSIZE = (20, 15)
 
-app.logger.info("Starting analysis...")
+# Column types of the extracted data. Strings with few distinct values are stored as categoricals
+# Prices and revenue are extracted as integer cents and converted to euros in prepare_data
+DATE_COLUMNS = ["date", "completed_at"]
+ORDER_DTYPES = {
+    "orderid": "int64",
+    "waiter": "category",
+    "table": "category",
+    "price": "int64",
+    "numproducts": "int64",
+}
+PRODUCT_DTYPES = {
+    "name": "category",
+    "price": "int64",
+    "amount": "int64",
+    "waiter": "category",
+    "table": "category",
+    "orderid": "int64",
+}
+ROLLUP_DTYPES = {
+    "bar": "category",
+    "orders": "int64",
+    "items": "int64",
+    "revenue": "int64",
+    "completions": "int64",
+    "completion_time": "float64",
+}
+
+
+def extract_data(engine, condition=None):
+    """Create dataframes from databases. Note: only completed orders are handled
+    An additional sql condition can be given to only extract some of the orders."""
+    import pandas as pd
+
+    completed = Order.completed_at.isnot(None)
+    if condition is not None:
+        completed &= condition
+
+    # One row per order, product sums are computed by the database
+    orders_query = (
+        select(
+            Order.id.label("orderid"),
+            Order.date,
+            Order.completed_at,
+            Order.waiter,
+            Order.table,
+            func.coalesce(func.sum(Product.price * Product.amount), 0).label("price"),
+            func.count(Product.id).label("numproducts"),
+        )
+        .outerjoin(Order.products)
+        .filter(completed)
+        .group_by(Order.id)
+    )
+
+    # One row per product with the data of the corresponding order
+    products_query = (
+        select(
+            CatalogItem.name,
+            Product.price,
+            Product.amount,
+            Order.date,
+            Order.completed_at,
+            Order.waiter,
+            Order.table,
+            Order.id.label("orderid"),
+        )
+        .join(Product.order)
+        .join(Product.item)
+        .filter(completed)
+    )
+
+    with engine.connect() as connection:
+        df_orders = pd.read_sql(orders_query, connection, parse_dates=DATE_COLUMNS, dtype=ORDER_DTYPES)
+        df_products = pd.read_sql(products_query, connection, parse_dates=DATE_COLUMNS, dtype=PRODUCT_DTYPES)
+
+    return df_orders, df_products
+
+
+def extract_rollups(engine):
+    """Read the per minute rollups maintained by the server. Databases of older versions have no rollups."""
+    import pandas as pd
+
+    if not inspect(engine).has_table(Rollup.__tablename__):
+        return pd.DataFrame({"bucket": pd.Series(dtype="datetime64[us]")}).assign(
+            **{c: pd.Series(dtype=t) for c, t in ROLLUP_DTYPES.items()}
+        )
+
+    with engine.connect() as connection:
+        return pd.read_sql(select(Rollup), connection, parse_dates=["bucket"], dtype=ROLLUP_DTYPES)
+
+
+def count_orders(engine, condition):
+    with engine.connect() as connection:
+        return connection.execute(select(func.count(Order.id)).filter(condition)).scalar_one()
+
+
+def extract_data_cached(engine, database, cache_dir):
+    """Extract data using a feather cache per database. Only orders completed after the last run are read."""
+    import pandas as pd
+
+    database = os.path.abspath(database)
+    cache_path = os.path.join(cache_dir, hashlib.sha1(database.encode()).hexdigest())  # noqa: S324
+    orders_file = os.path.join(cache_path, "orders.feather")
+    products_file = os.path.join(cache_path, "products.feather")
+    meta_file = os.path.join(cache_path, "meta.json")
+
+    meta = None
+    if os.path.isfile(meta_file):
+        with open(meta_file, encoding="utf-8") as afile:
+            meta = json.load(afile)
+
+    if meta is not None and meta.get("version") != CACHE_VERSION:
+        logger.info("Cache of %s has an old format. Rebuilding cache...", database)
+        meta = None
+
+    if meta is not None:
+        max_id, max_completed_at = meta["max_id"], datetime.fromisoformat(meta["max_completed_at"])
+
+        # Cached orders are immutable, but the database file may have been replaced by a new one
+        cached = Order.completed_at.isnot(None) & (Order.id <= max_id) & (Order.completed_at <= max_completed_at)
+        if count_orders(engine, cached) != meta["orders"]:
+            logger.info("%s changed since last run. Rebuilding cache...", database)
+            meta = None
+
+    if meta is None:
+        logger.info("Extracting data from %s...", database)
+        dfo, dfp = extract_data(engine)
+    else:
+        logger.info("Extracting data newer than order %s / %s from %s...", max_id, max_completed_at, database)
+        dfo_new, dfp_new = extract_data(engine, (Order.id > max_id) | (Order.completed_at > max_completed_at))
+
+        dfo = pd.concat([pd.read_feather(orders_file), dfo_new], ignore_index=True)
+        dfp = pd.concat([pd.read_feather(products_file), dfp_new], ignore_index=True)
+
+        # Concatenating categoricals with different categories results in object columns
+        dfo = dfo.astype(ORDER_DTYPES)
+        dfp = dfp.astype(PRODUCT_DTYPES)
+
+        logger.info("Read %s new orders, %s orders cached", len(dfo_new), meta["orders"])
+
+    if not dfo.empty:
+        os.makedirs(cache_path, exist_ok=True)
+        dfo.to_feather(orders_file)
+        dfp.to_feather(products_file)
+
+        with open(meta_file, "w", encoding="utf-8") as afile:
+            meta = {
+                "version": CACHE_VERSION,
+                "database": database,
+                "orders": len(dfo),
+                "max_id": int(dfo["orderid"].max()),
+                "max_completed_at": dfo["completed_at"].max().isoformat(),
+            }
+            json.dump(meta, afile)
+
+    return dfo, dfp
+
+
+def event_names(databases):
+    """Name events by database file name. Fall back to the full path if file names are not unique"""
+    stems = [os.path.splitext(os.path.basename(d))[0] for d in databases]
+    return stems if len(set(stems)) == len(stems) else list(databases)
+
 
+def archive_file(database):
+    """Archive database written by the server next to a database, e.g. data-archive.db for data.db"""
+    stem, ext = os.path.splitext(database)
+    return f"{stem}-archive{ext}"
 
-def extract_data():
-    """Create dataframes from databases. Note: only completed orders are handled"""
-    app.logger.info("Extracting data...")
-    with app.app_context():
 
-        def get_completed_orders() -> list[Order]:
-            return list(db.session.execute(db.select(Order).filter(Order.completed_at.isnot(None))).scalars())
+def open_database(database):
+    """Open a database read only, it may still be in use by the server. Databases of older versions are copied into
+    memory and migrated there, the file is never modified."""
+    connection = sqlite3.connect(f"file:{quote(os.path.abspath(database))}?mode=ro", uri=True, check_same_thread=False)
 
-        orders = get_completed_orders()
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    tables = connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products'").fetchone()
 
-        if not orders:
-            app.logger.error("No orders found. Terminating.")
-            exit()
+    if tables is not None and version < len(MIGRATIONS):
+        logger.info("%s has schema version %s. Migrating a copy in memory...", database, version)
+        memory = sqlite3.connect(":memory:", check_same_thread=False)
+        connection.backup(memory)
+        connection.close()
 
+        engine = create_engine("sqlite://", creator=lambda: memory, poolclass=StaticPool)
+        migrate(engine)
+        return engine
 
-        # Dataframes
-        datalist_orders = [
-            [
-                order.date,
-                order.completed_at - order.date,
-                order.waiter,
-                order.table,
-                sum(p.price * p.amount for p in order.products),
-                len(order.products),
-            ]
-            for order in orders
-        ]
+    return create_engine("sqlite://", creator=lambda: connection, poolclass=StaticPool)
 
-        datalist_products = [
-            [
-                product.name,
-                product.price,
-                product.amount,
-                order.date,
-                order.completed_at - order.date,
-                order.waiter,
-                order.table,
-                order.id,
-            ]
-            for order in orders
-            for product in order.products
-        ]
 
-        ocolumns = ["date", "ordertime", "waiter", "table", "price", "numproducts"]
-        pcolumns = ["name", "price", "amount", "date", "ordertime", "waiter", "table", "orderid"]
+def read_orders(database, cache_dir, start=None, end=None):
+    engine = open_database(database)
 
-        df_orders = pd.DataFrame(datalist_orders, columns=ocolumns)
-        df_products = pd.DataFrame(datalist_products, columns=pcolumns)
+    try:
+        if cache_dir is not None:
+            dfo, dfp = extract_data_cached(engine, database, cache_dir)
+        else:
+            logger.info("Extracting data from %s...", database)
+            condition = None
+            if start is not None:
+                condition = Order.date >= start
+            if end is not None:
+                condition = Order.date < end if condition is None else condition & (Order.date < end)
+            dfo, dfp = extract_data(engine, condition)
 
-        df_orders["ordertime"] = df_orders["ordertime"].dt.round("1s").dt.seconds  # datetime to seconds
+        dfr = extract_rollups(engine)
+    finally:
+        engine.dispose()
 
-        return df_orders, df_products
+    return dfo, dfp, dfr
+
+
+def read_database(database, event, cache_dir, start=None, end=None):
+    """Read completed orders of one database and its archive, restricted to orders created in [start, end)"""
+    import pandas as pd
+
+    dfo, dfp, dfr = read_orders(database, cache_dir, start, end)
+
+    if os.path.isfile(archive := archive_file(database)):
+        dfo_archive, dfp_archive, _ = read_orders(archive, cache_dir, start, end)
+        dfo = pd.concat([dfo_archive, dfo], ignore_index=True).astype(ORDER_DTYPES)
+        dfp = pd.concat([dfp_archive, dfp], ignore_index=True).astype(PRODUCT_DTYPES)
+
+    # The cache contains all orders, apply the time window afterwards
+    if start is not None:
+        dfo, dfp, dfr = dfo[dfo["date"] >= start], dfp[dfp["date"] >= start], dfr[dfr["bucket"] >= start]
+    if end is not None:
+        dfo, dfp, dfr = dfo[dfo["date"] < end], dfp[dfp["date"] < end], dfr[dfr["bucket"] < end]
+
+    return dfo.assign(event=event), dfp.assign(event=event), dfr.assign(event=event)
+
+
+def read_databases(databases, cache_dir, start=None, end=None):
+    """Read multiple databases in parallel and concatenate them into one dataset"""
+    import pandas as pd
+
+    if missing := [d for d in databases if not os.path.isfile(d)]:
+        logger.error("Database %s not found. Terminating.", ", ".join(missing))
+        exit()
+
+    events = event_names(databases)
+
+    with ThreadPoolExecutor(max_workers=min(len(databases), os.cpu_count() or 1)) as executor:
+        results = list(executor.map(lambda de: read_database(*de, cache_dir, start, end), zip(databases, events)))
+
+    dfo = pd.concat([r[0] for r in results], ignore_index=True).astype(ORDER_DTYPES | {"event": "category"})
+    dfp = pd.concat([r[1] for r in results], ignore_index=True).astype(PRODUCT_DTYPES | {"event": "category"})
+    dfr = pd.concat([r[2] for r in results], ignore_index=True).astype(ROLLUP_DTYPES | {"event": "category"})
+
+    # Order ids are only unique within a database
+    dfp["orderid"] = dfp["event"].astype(str) + "/" + dfp["orderid"].astype(str)
+
+    return dfo, dfp, dfr
+
+
+def prepare_data(df_orders, df_products, df_rollups):
+    """Convert extracted data to the format used by the figures"""
+    if df_orders.empty:
+        logger.error("No orders found. Terminating.")
+        exit()
+
+    df_orders = df_orders.copy()
+    df_products = df_products.copy()
+    df_rollups = df_rollups.copy()
+
+    # datetime to timedelta (products) and seconds (orders)
+    df_orders["ordertime"] = (df_orders.pop("completed_at") - df_orders["date"]).dt.round("1s").dt.seconds
+    df_products["ordertime"] = df_products.pop("completed_at") - df_products["date"]
+
+    # cents to euros
+    df_orders["price"] = df_orders["price"] / 100
+    df_products["price"] = df_products["price"] / 100
+    df_rollups["revenue"] = df_rollups["revenue"] / 100
+
+    # Drop categories which only occur outside of the analyzed time window
+    for df in (df_orders, df_products, df_rollups):
+        for column in df.select_dtypes("category"):
+            df[column] = df[column].cat.remove_unused_categories()
+
+    ocolumns = ["date", "ordertime", "waiter", "table", "price", "numproducts", "event"]
+    pcolumns = ["name", "price", "amount", "date", "ordertime", "waiter", "table", "orderid", "event"]
+
+    return df_orders[ocolumns], df_products[pcolumns], df_rollups
 
 
 def newplot():
+    import matplotlib.pyplot as plt
+
     return plt.subplots(figsize=FIGSIZE)
 
 
@@ -80,6 +330,8 @@ def fig_general(dfo, dfp):
     total_revenue = (dfp["price"] * dfp["amount"]).sum()
     average_ordertime = round(dfo["ordertime"].mean())
 
+    import matplotlib.pyplot as plt
+
     fig = plt.figure(figsize=FIGSIZE)
     fig.clf()
 
@@ -243,6 +495,8 @@ def fig_revenue_by_waiter(_, dfp):
 
 def fig_products_by_time(_, dfp):
     """Create products by time figure"""
+    import numpy as np
+
     fig, ax = newplot()
 
     df = (
@@ -279,32 +533,100 @@ def fig_revenue_by_time(dfo, _):
     return fig
 
 
-def create_figs(dfo, dfp):
-    app.logger.info("Creating figures...")
-    dfs = (dfo, dfp)
-    return [
-        x(*dfs)
-        for x in [
-            fig_general,
-            fig_sold_products,
-            fig_ordertime_hist,
-            fig_ordertime_by_time,
-            fig_ordertime_by_product,
-            fig_table_by_waiter,
-            fig_products_orders_by_table,
-            fig_revenue_by_table,
-            #fig_orders_by_waiter_by_time,
-            #fig_products_orders_by_waiter,
-            #fig_revenue_by_waiter,
-            fig_products_by_time,
-            fig_revenue_by_time,
-        ]
-    ]
+def fig_products_by_bar_by_time(dfr):
+    """Create products by bar by time figure (from rollups)"""
+    fig, ax = newplot()
+
+    df = (
+        dfr[dfr["bar"] != Rollup.ROLLUP_ALL]
+        .pivot_table(index="bucket", columns="bar", values="items", aggfunc="sum", fill_value=0, observed=True)
+        .resample("5min")
+        .sum()
+    )
+
+    df.plot(title="Produkte pro Bar nach Zeit (5min)", xlabel="Zeit", ylabel="Anzahl", ax=ax)
+    ax.legend(title="Bar")
+
+    return fig
+
+
+def fig_by_event(dfo, dfp):
+    """Create orders/products/revenue by event figure"""
+    import matplotlib.pyplot as plt
+
+    fig, (ax1, ax2, ax3) = plt.subplots(1, 3, figsize=FIGSIZE)
+
+    dfo.groupby("event", observed=True).size().plot.bar(title="Bestellungen", xlabel="Event", ax=ax1)
+    dfp.groupby("event", observed=True)["amount"].sum().plot.bar(title="Verkaufte Produkte", xlabel="Event", ax=ax2)
+    dfo.groupby("event", observed=True)["price"].sum().plot.bar(title="Umsatz in €", xlabel="Event", ax=ax3)
+
+    return fig
+
+
+def fig_ordertime_by_event(dfo, _):
+    """Create ordertime by event figure"""
+    fig, ax = newplot()
+
+    df = dfo[["event", "ordertime"]].groupby("event", observed=True).agg(["mean", "max", "min"])["ordertime"]
+    df.plot.bar(title="Bearbeitungsdauer pro Event", xlabel="Event", ylabel="Bearbeitungsdauer (s)", ax=ax)
+    ax.legend(["Average", "Max", "Min"])
+
+    return fig
+
+
+FIGURES = [
+    fig_general,
+    fig_sold_products,
+    fig_ordertime_hist,
+    fig_ordertime_by_time,
+    fig_ordertime_by_product,
+    fig_table_by_waiter,
+    fig_products_orders_by_table,
+    fig_revenue_by_table,
+    # fig_orders_by_waiter_by_time,
+    # fig_products_orders_by_waiter,
+    # fig_revenue_by_waiter,
+    fig_products_by_time,
+    fig_revenue_by_time,
+]
+
+# Figures computed from the rollups instead of orders and products, skipped if no rollups exist
+ROLLUP_FIGURES = [
+    fig_products_by_bar_by_time,
+]
+
+# Additional figures if multiple databases are analyzed
+EVENT_FIGURES = [
+    fig_by_event,
+    fig_ordertime_by_event,
+]
+
+
+def figures_for(dfo, dfr):
+    figures = FIGURES.copy()
+
+    if (dfr["bar"] != Rollup.ROLLUP_ALL).any():
+        figures += ROLLUP_FIGURES
+    if dfo["event"].nunique() > 1:
+        figures += EVENT_FIGURES
+
+    return figures
+
+
+def make_fig(fig_function, dfo, dfp, dfr):
+    return fig_function(dfr) if fig_function in ROLLUP_FIGURES else fig_function(dfo, dfp)
+
+
+def create_figs(dfo, dfp, dfr):
+    logger.info("Creating figures...")
+    return [make_fig(x, dfo, dfp, dfr) for x in figures_for(dfo, dfr)]
 
 
 def save_figs(figs):
     """Save figures as pdf"""
-    app.logger.info("Saving figures...")
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    logger.info("Saving figures...")
 
     with PdfPages(PDF_FILENAME) as pp:
         for fig in figs:
@@ -312,9 +634,95 @@ def save_figs(figs):
     print(f"Analysis written to '{PDF_FILENAME}'")
 
 
-# Do analysis and save figures as pdf
-figs = create_figs(*extract_data())
-save_figs(figs)
+# Dataframes of a worker process, loaded once per worker by init_worker
+worker_dfs: tuple = ()
+
+
+def init_worker(dirname):
+    """Load the dataframes written by create_figs_parallel"""
+    import pandas as pd
+
+    global worker_dfs
+    worker_dfs = (
+        pd.read_feather(os.path.join(dirname, "orders.feather")),
+        pd.read_feather(os.path.join(dirname, "products.feather")),
+        pd.read_feather(os.path.join(dirname, "rollups.feather")),
+    )
+
+
+def render_fig(fig_function):
+    """Create a single figure and render it to a one page pdf"""
+    import matplotlib.pyplot as plt
+
+    fig = make_fig(fig_function, *worker_dfs)
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="pdf", dpi=300)
+    plt.close(fig)
+
+    return buffer.getvalue()
+
+
+def create_figs_parallel(dfo, dfp, dfr, workers):
+    """Render figures in a process pool and merge the pages in the original order"""
+    from pypdf import PdfReader, PdfWriter
+
+    logger.info("Creating and saving figures with %s workers...", workers)
+
+    with tempfile.TemporaryDirectory() as dirname:
+        # Pass the dataframes via feather files instead of pickling them for every figure
+        dfo.to_feather(os.path.join(dirname, "orders.feather"))
+        dfp.to_feather(os.path.join(dirname, "products.feather"))
+        dfr.to_feather(os.path.join(dirname, "rollups.feather"))
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(dirname,)) as executor:
+            pages = list(executor.map(render_fig, figures_for(dfo, dfr)))
+
+    writer = PdfWriter()
+    for page in pages:
+        writer.append(PdfReader(io.BytesIO(page)))
+    writer.write(PDF_FILENAME)
+
+    print(f"Analysis written to '{PDF_FILENAME}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create analysis.pdf from the completed orders")
+    parser.add_argument(
+        "databases", nargs="*", help="database files to analyze, one per event (default: the database of the app)"
+    )
+    parser.add_argument("--from", dest="start", type=datetime.fromisoformat, help="only orders created from this time")
+    parser.add_argument("--to", dest="end", type=datetime.fromisoformat, help="only orders created before this time")
+    parser.add_argument(
+        "-j", "--workers", type=int, default=os.cpu_count() or 1, help="number of processes used to render figures"
+    )
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="directory of the extracted data cache")
+    parser.add_argument("--no-cache", action="store_true", help="always read all orders from the database")
+    args = parser.parse_args()
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(CustomFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+    logger.info("Starting analysis...")
+
+    # The database of the app in the instance folder next to the package
+    instance_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance")
+    databases = args.databases or [os.path.join(instance_path, Config.DATABASE_FILE)]
+    cache_dir = None if args.no_cache else args.cache_dir
+
+    # Do analysis and save figures as pdf
+    dfs = prepare_data(*read_databases(databases, cache_dir, args.start, args.end))
+
+    if args.workers > 1:
+        create_figs_parallel(*dfs, args.workers)
+    else:
+        save_figs(create_figs(*dfs))
+
+        # Show figures in window (uncomment if pyqt5 is available)
+        # plt.show()
+
 
-# Show figures in window (uncomment if pyqt5 is available)
-# plt.show()
+if __name__ == "__main__":
+    main()
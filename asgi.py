@@ -0,0 +1,8 @@
+"""Entry point for asgi servers, e.g. uvicorn --workers 4 asgi:app
+
+Bar screens are updated via server-sent events instead of polling, all other requests are handled as with run.py."""
+
+from mini_pos import create_app
+from mini_pos.asgi import create_asgi_app
+
+app = create_asgi_app(create_app())
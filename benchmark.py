@@ -0,0 +1,148 @@
+#!/usr/bin/python3
+
+"""Compare throughput and latency of order submission and completion in the direct and the queue write mode.
+
+Several processes (like gunicorn workers) with several threads each submit orders and complete them at the bar
+against a fresh database in a temporary directory."""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from mini_pos import create_app
+from mini_pos.models import Order, db
+from mini_pos.settings import Config
+
+
+def make_config(directory: str, mode: str, config_file: str):
+    database = os.path.join(directory, "benchmark.db")
+
+    class BenchmarkConfig(Config):
+        CONFIG_FILE = config_file
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{database}"
+        SQLALCHEMY_BINDS = {"archive": f"sqlite:///{database}-archive"}
+        ARCHIVE_AFTER = None
+        BACKUP_INTERVAL = None
+        TRAFFIC_LOG_FILE = None
+        LOG_FILE = None
+        WRITE_MODE = mode
+        WRITER_SOCKET = os.path.join(directory, "writer.sock")
+
+    return BenchmarkConfig
+
+
+def init_database(directory: str, config_file: str) -> None:
+    create_app(make_config(directory, "direct", config_file))
+
+
+def run_worker(worker: int, args, directory: str, barrier, results) -> None:
+    """Submit and complete orders from several threads of one process"""
+    app = create_app(make_config(directory, args.mode, args.config))
+    app.logger.setLevel(logging.ERROR)
+
+    products = list(app.config["minipos"].products)[:2]
+    table = app.config["minipos"].tables.names[0]
+
+    def run_thread(thread: int, latencies: dict[str, list[float]]) -> None:
+        client = app.test_client()
+
+        for number in range(args.orders):
+            nonce = (worker * args.threads + thread) * args.orders + number
+            form = {"nonce": str(nonce)} | {f"amount-{p}": "1" for p in products}
+
+            begin = time.perf_counter()
+            response = client.post(f"/service/{table}", data=form)
+            latencies["submit" if response.status_code < 400 else "error"].append(time.perf_counter() - begin)
+
+            with app.app_context():
+                order_id = db.session.execute(db.select(Order.id).filter_by(nonce=nonce)).scalar_one_or_none()
+            if order_id is None:
+                continue
+
+            begin = time.perf_counter()
+            response = client.post("/bar/default", data={"order-completed": str(order_id)})
+            latencies["complete" if response.status_code < 400 else "error"].append(time.perf_counter() - begin)
+
+    thread_latencies: list[dict[str, list[float]]] = [
+        {"submit": [], "complete": [], "error": []} for _ in range(args.threads)
+    ]
+    threads = [threading.Thread(target=run_thread, args=(i, thread_latencies[i])) for i in range(args.threads)]
+
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    end = time.perf_counter()
+
+    results.put((start, end, {key: [x for t in thread_latencies for x in t[key]] for key in thread_latencies[0]}))
+
+
+def benchmark(args) -> dict:
+    ctx = multiprocessing.get_context("fork")
+
+    with tempfile.TemporaryDirectory() as directory:
+        init = ctx.Process(target=init_database, args=(directory, args.config))
+        init.start()
+        init.join()
+
+        barrier = ctx.Barrier(args.workers)
+        results = ctx.Queue()
+        workers = [
+            ctx.Process(target=run_worker, args=(i, args, directory, barrier, results)) for i in range(args.workers)
+        ]
+        for worker in workers:
+            worker.start()
+
+        collected = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+
+    result: dict = {"duration": max(end for _, end, _ in collected) - min(start for start, _, _ in collected)}
+    for key in ("submit", "complete", "error"):
+        result[key] = sorted(x * 1000 for *_, latencies in collected for x in latencies[key])
+
+    return result
+
+
+def report(mode: str, result: dict) -> None:
+    requests = sum(len(result[key]) for key in ("submit", "complete", "error"))
+    print(
+        f"\n{mode}: {requests} requests in {result['duration']:.2f}s, {requests / result['duration']:.1f} requests/s, "
+        f"{len(result['error'])} errors"
+    )
+    print(f"{'request':<10} {'count':>6} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+
+    for key in ("submit", "complete"):
+        if not (latencies := result[key]):
+            continue
+        pct = [latencies[min(len(latencies) - 1, int(len(latencies) * q))] for q in (0.5, 0.95, 0.99)]
+        print(
+            f"{key:<10} {len(latencies):>6} {statistics.fmean(latencies):>8.2f} "
+            f"{pct[0]:>8.2f} {pct[1]:>8.2f} {pct[2]:>8.2f} {latencies[-1]:>8.2f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-w", "--workers", type=int, default=4, help="processes, like gunicorn workers")
+    parser.add_argument("-t", "--threads", type=int, default=4, help="concurrent clients per process")
+    parser.add_argument("-n", "--orders", type=int, default=50, help="orders per client")
+    parser.add_argument("-m", "--mode", choices=("direct", "queue", "both"), default="both", help="write mode")
+    parser.add_argument("-c", "--config", default="config.json", help="config file")
+    args = parser.parse_args()
+
+    for mode in ("direct", "queue") if args.mode == "both" else (args.mode,):
+        args.mode = mode
+        report(mode, benchmark(args))
+    print("\nLatencies in ms")
+
+
+if __name__ == "__main__":
+    main()
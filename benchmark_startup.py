@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+
+"""Measure the cold start of a worker, e.g. after a crash: imports, create_app and the first requests.
+
+Every run starts a fresh process against the same database. The first run compiles the templates into the template
+cache, later runs load them like a restarted worker."""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def child(directory: str, config_file: str, *, template_cache: bool) -> None:
+    """Runs in the measured process, prints the durations as json"""
+    begin = time.perf_counter()
+
+    from mini_pos import create_app
+    from mini_pos.settings import Config
+
+    imported = time.perf_counter()
+
+    database = os.path.join(directory, "startup.db")
+
+    class StartupConfig(Config):
+        CONFIG_FILE = config_file
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{database}"
+        SQLALCHEMY_BINDS = {"archive": f"sqlite:///{database}-archive"}
+        ARCHIVE_AFTER = None
+        BACKUP_INTERVAL = None
+        TRAFFIC_LOG_FILE = None
+        LOG_FILE = None
+        WRITE_MODE = "direct"
+        TEMPLATE_CACHE_DIR = os.path.join(directory, "template-cache") if template_cache else None
+
+    app = create_app(StartupConfig)
+    created = time.perf_counter()
+
+    client = app.test_client()
+    for path in ("/bar/default", "/service"):
+        client.get(path)
+    requested = time.perf_counter()
+
+    print(json.dumps({"import": imported - begin, "create_app": created - imported, "requests": requested - created}))
+
+
+def run(directory: str, args) -> dict:
+    command = [sys.executable, __file__, "--child", directory, "--config", args.config]
+    if args.no_template_cache:
+        command.append("--no-template-cache")
+
+    begin = time.perf_counter()
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout  # noqa: S603
+    result = json.loads(output)
+    result["process"] = time.perf_counter() - begin
+
+    return result
+
+
+def report(results: list[dict]) -> None:
+    print(f"{'phase':<12} {'min':>8} {'p50':>8} {'max':>8}")
+
+    for key in ("import", "create_app", "requests", "process"):
+        values = sorted(r[key] * 1000 for r in results)
+        print(f"{key:<12} {values[0]:>8.1f} {statistics.median(values):>8.1f} {values[-1]:>8.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--runs", type=int, default=10, help="number of measured processes")
+    parser.add_argument("-t", "--target", type=float, default=1.0, help="maximum median cold start in seconds")
+    parser.add_argument("-c", "--config", default="config.json", help="config file")
+    parser.add_argument("--no-template-cache", action="store_true", help="compile the templates in every process")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        child(args.child, os.path.abspath(args.config), template_cache=not args.no_template_cache)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        run(directory, args)  # create the database and fill the template cache
+        results = [run(directory, args) for _ in range(args.runs)]
+
+    report(results)
+
+    median = statistics.median(r["process"] for r in results)
+    print(f"\nCold start {median:.2f}s (target {args.target:.2f}s), durations in ms")
+
+    if median > args.target:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
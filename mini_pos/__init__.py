@@ -2,13 +2,21 @@ import logging
 
 from flask import Flask
 
-from .config import init_config
-from .log import init_logging
+from .assets import init_assets, init_template_cache
+from .cache import init_cache
+from .commands import init_tasks, register_commands
+from .compression import init_compression
+from .config import init_config, init_config_reload
+from .log import configure_logging, init_logging
 from .models import init_db
+from .printing import init_printing
+from .recorder import init_recorder
 from .routes import register_blueprints
+from .writer import init_writer, start_writer
 
 
-def create_app(config=None) -> Flask:
+def create_app(config=None, *, background: bool = True) -> Flask:
+    """Create the app. With background=False, background threads are not started, see start_background"""
     app: Flask = Flask(__name__)
 
     # initialize logging first because other modules depend on it
@@ -23,12 +31,50 @@ def create_app(config=None) -> Flask:
 
         app.config.from_object(config)
 
+        configure_logging(app)
+
         init_config(app)
 
         # initialize db after configuration
         init_db(app)
 
+        # Publish the config to other workers and watch for changes, requires the db
+        init_config_reload(app)
+
+        # Single writer for order submission and completion if enabled, started with the background threads
+        init_writer(app)
+
+        # Cache for rendered views
+        init_cache(app)
+
         # Add routes
         register_blueprints(app)
 
+        # Compressed responses and fingerprinted static files
+        init_compression(app)
+        init_assets(app)
+        init_template_cache(app)
+
+        # Record traffic for replay.py if enabled
+        init_recorder(app)
+
+        # Flask cli commands
+        register_commands(app)
+
+    if background:
+        start_background(app)
+
     return app
+
+
+def start_background(app: Flask) -> None:
+    """Start the writer, print workers and periodic maintenance tasks.
+    Threads do not survive a fork, servers preloading the app call this in every worker (see serve.py)."""
+    with app.app_context():
+        if app.config["WRITE_MODE"] == "queue":
+            start_writer(app)
+
+        # Print bons in the background
+        init_printing(app)
+
+        init_tasks(app)
@@ -0,0 +1,232 @@
+"""ASGI serving mode with server-sent events for the bar view (see asgi.py).
+
+Bar screens subscribe to /push/bar/<bar> and receive the bar body whenever the state version changes. Streams are
+coroutines, an idle screen costs nothing but a waiting coroutine. One poller per process checks the state version.
+Database access, rendering and all other requests, which are handled by the flask app, run in a bounded thread pool.
+"""
+
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import load_latest_config
+from .models import get_state_version
+from .routes.fetch import render_bar_body
+
+THREADS = 16  # threads for flask requests and database access
+POLL_INTERVAL = 1  # seconds between checks of the state version
+KEEPALIVE = 15  # seconds, comments keep proxies from closing idle streams
+PUSH_PREFIX = "/push/bar/"
+
+
+def build_environ(scope: dict, body: bytes) -> dict:
+    """WSGI environ of an ASGI http scope"""
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin1"),
+        "PATH_INFO": scope["path"].encode().decode("latin1"),
+        "QUERY_STRING": scope["query_string"].decode("ascii"),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "SERVER_NAME": scope["server"][0] if scope.get("server") else "localhost",
+        "SERVER_PORT": str(scope["server"][1]) if scope.get("server") else "80",
+        "REMOTE_ADDR": scope["client"][0] if scope.get("client") else "",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": io.StringIO(),
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+
+    for name, value in scope.get("headers", []):
+        key = name.decode("latin1").upper().replace("-", "_")
+        if key not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            key = f"HTTP_{key}"
+        # repeated headers are joined as in http/1.1
+        environ[key] = f"{environ[key]},{value.decode('latin1')}" if key in environ else value.decode("latin1")
+
+    return environ
+
+
+class Poller:
+    """Check the state version once per process and wake up all streams if it changed"""
+
+    def __init__(self, app, executor: ThreadPoolExecutor) -> None:
+        self.app = app
+        self.executor = executor
+        self.version: str | None = None
+        self.changed = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+    def poll(self) -> str:
+        with self.app.app_context():
+            load_latest_config()
+            return get_state_version()
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while True:
+            try:
+                version = await loop.run_in_executor(self.executor, self.poll)
+            except Exception:
+                self.app.logger.exception("Polling the state version failed. Retrying...")
+            else:
+                if version != self.version:
+                    self.version = version
+                    # wake up all waiting streams, later waiters use the new event
+                    self.changed.set()
+                    self.changed = asyncio.Event()
+
+            await asyncio.sleep(POLL_INTERVAL)
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def wait(self, version: object, timeout: float) -> bool:
+        """Wait until the state version differs from version. Returns False on timeout"""
+        if self.version != version:
+            return True
+
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout)
+        except TimeoutError:
+            return False
+        return True
+
+
+class MiniPOSAsgi:
+    def __init__(self, app) -> None:
+        self.app = app
+        self.executor = ThreadPoolExecutor(max_workers=THREADS, thread_name_prefix="asgi")
+        self.poller = Poller(app, self.executor)
+
+    async def __call__(self, scope: dict, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] != "http":
+            msg = f"Unsupported scope {scope['type']}"
+            raise ValueError(msg)
+        elif scope["path"].startswith(PUSH_PREFIX) and scope["method"] == "GET":
+            await self.push_bar(scope["path"][len(PUSH_PREFIX) :], receive, send)
+        else:
+            await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.poller.start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def wsgi(self, scope: dict, receive, send) -> None:
+        """Handle a request with the flask app in the thread pool"""
+        body = bytearray()
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self.run_wsgi, build_environ(scope, bytes(body)), send, loop)
+
+    def run_wsgi(self, environ: dict, send, loop) -> None:
+        def call(message: dict) -> None:
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        start: dict = {}
+
+        def start_response(status: str, headers: list, exc_info=None) -> None:  # noqa: ARG001
+            start["status"] = int(status.split(" ", 1)[0])
+            start["headers"] = [(k.lower().encode("latin1"), v.encode("latin1")) for k, v in headers]
+
+        result = self.app(environ, start_response)
+        try:
+            # streamed responses (e.g. exports) are sent chunk by chunk
+            started = False
+            for chunk in result:
+                if not started:
+                    call({"type": "http.response.start", **start})
+                    started = True
+                if chunk:
+                    call({"type": "http.response.body", "body": chunk, "more_body": True})
+
+            if not started:
+                call({"type": "http.response.start", **start})
+            call({"type": "http.response.body", "body": b""})
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+
+    def render(self, bar: str) -> tuple[str, str, str]:
+        """Returns state version, config version and the bar body"""
+        with self.app.test_request_context(f"{PUSH_PREFIX}{bar}"):
+            load_latest_config()
+            version = get_state_version()
+            return version, str(self.app.extensions["minipos_config"]["version"]), render_bar_body(bar, version)
+
+    async def push_bar(self, bar: str, receive, send) -> None:
+        if self.app.config["minipos"].bars.get(bar) is None:
+            await send({"type": "http.response.start", "status": 404, "headers": [(b"content-type", b"text/plain")]})
+            await send({"type": "http.response.body", "body": b"Error! Bar not found"})
+            return
+
+        self.poller.start()  # servers without lifespan support
+        loop = asyncio.get_running_loop()
+        disconnected = loop.create_task(wait_disconnect(receive))
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"),  # disable proxy buffering
+                ],
+            }
+        )
+
+        seen: object = object()  # version of the poller the body was last rendered for
+        sent = None  # state version of the last sent body
+        try:
+            while not disconnected.done():
+                if self.poller.version != seen:
+                    seen = self.poller.version
+                    version, config_version, body = await loop.run_in_executor(self.executor, self.render, bar)
+                    if version == sent:
+                        continue
+                    sent = version
+                    message = f"event: config\ndata: {config_version}\n\n" + event("bar", body)
+                elif await self.poller.wait(seen, KEEPALIVE):
+                    continue
+                else:
+                    message = ": keepalive\n\n"
+
+                await send({"type": "http.response.body", "body": message.encode(), "more_body": True})
+        except OSError:
+            pass  # client disconnected while sending
+        finally:
+            disconnected.cancel()
+
+
+def event(name: str, data: str) -> str:
+    """Server-sent event, every line of data is sent as data field"""
+    return f"event: {name}\n" + "".join(f"data: {line}\n" for line in data.split("\n")) + "\n"
+
+
+async def wait_disconnect(receive) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+def create_asgi_app(app) -> MiniPOSAsgi:
+    app.logger.info("Serving via asgi with %s threads", THREADS)
+    return MiniPOSAsgi(app)
@@ -0,0 +1,121 @@
+"""Fingerprinted and precompressed static files.
+
+`flask assets` copies all static files to static/dist with a hash of their content in the name and writes
+compressed variants next to them. Templates reference static files with asset_url, which returns the fingerprinted
+file if the manifest exists. Fingerprinted files never change and are cached by browsers without revalidation.
+"""
+
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+from flask import current_app as app
+from flask import request, send_from_directory, url_for
+from jinja2 import FileSystemBytecodeCache
+
+from .compression import ENCODINGS, compress
+
+ASSETS_DIR = "dist"
+MANIFEST_FILE = "manifest.json"
+COMPRESS_EXTENSIONS = {".css", ".js", ".svg", ".json", ".txt"}
+ENCODING_EXTENSIONS = {"br": ".br", "gzip": ".gz"}
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def build_assets(static_folder: str) -> dict[str, str]:
+    """Write fingerprinted and compressed copies of all static files. Returns the manifest"""
+    dist = os.path.join(static_folder, ASSETS_DIR)
+    shutil.rmtree(dist, ignore_errors=True)
+    manifest = {}
+
+    for root, dirs, files in os.walk(static_folder):
+        if root == static_folder and ASSETS_DIR in dirs:
+            dirs.remove(ASSETS_DIR)
+
+        for name in sorted(files):
+            filename = os.path.relpath(os.path.join(root, name), static_folder).replace(os.sep, "/")
+
+            with open(os.path.join(root, name), "rb") as afile:
+                data = afile.read()
+
+            stem, ext = os.path.splitext(filename)
+            fingerprinted = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+            variants = {"": data}
+
+            if ext in COMPRESS_EXTENSIONS:
+                for encoding in ENCODINGS:
+                    variants[ENCODING_EXTENSIONS[encoding]] = compress(data, encoding, 11 if encoding == "br" else 9)
+
+            target = os.path.join(dist, fingerprinted)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            for suffix, content in variants.items():
+                with open(target + suffix, "wb") as afile:
+                    afile.write(content)
+
+            manifest[filename] = fingerprinted
+
+    with open(os.path.join(dist, MANIFEST_FILE), "w", encoding="utf-8") as afile:
+        json.dump(manifest, afile, indent=2)
+
+    return manifest
+
+
+def asset_url(filename: str) -> str:
+    if (fingerprinted := app.extensions["minipos_assets"].get(filename)) is not None:
+        return url_for("static", filename=f"{ASSETS_DIR}/{fingerprinted}")
+
+    return url_for("static", filename=filename)
+
+
+def serve_precompressed():
+    """Serve the compressed variant of a fingerprinted file if the client accepts it"""
+    if request.endpoint != "static" or not request.view_args["filename"].startswith(f"{ASSETS_DIR}/"):
+        return None
+
+    filename = request.view_args["filename"]
+    if (encoding := request.accept_encodings.best_match(ENCODINGS)) is None:
+        return None
+
+    compressed = filename + ENCODING_EXTENSIONS[encoding]
+    if not os.path.isfile(os.path.join(app.static_folder, compressed)):
+        return None
+
+    response = send_from_directory(app.static_folder, compressed, mimetype=mimetypes.guess_type(filename)[0])
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def add_cache_headers(response):
+    if request.endpoint == "static" and request.view_args["filename"].startswith(f"{ASSETS_DIR}/"):
+        response.headers["Cache-Control"] = IMMUTABLE
+        response.vary.add("Accept-Encoding")
+
+    return response
+
+
+def init_assets(app) -> None:
+    manifest_file = os.path.join(app.static_folder, ASSETS_DIR, MANIFEST_FILE)
+    manifest = {}
+
+    if os.path.isfile(manifest_file):
+        with open(manifest_file, encoding="utf-8") as afile:
+            manifest = json.load(afile)
+        app.logger.info("Using %s fingerprinted static files", len(manifest))
+
+    app.extensions["minipos_assets"] = manifest
+    app.add_template_global(asset_url)
+    app.before_request(serve_precompressed)
+    app.after_request(add_cache_headers)
+
+
+def init_template_cache(app) -> None:
+    """Keep compiled templates on disk. Templates are compiled once, restarted workers only load them.
+    Entries contain a checksum of the template source, changed templates are compiled again."""
+    if (path := app.config["TEMPLATE_CACHE_DIR"]) is None:
+        return
+
+    path = os.path.join(app.instance_path, path)
+    os.makedirs(path, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(path)
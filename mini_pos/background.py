@@ -0,0 +1,66 @@
+import fcntl
+import os
+import threading
+import time
+
+
+def try_lock(lock_file: str) -> int | None:
+    """Take an exclusive lock on a file without blocking. Returns the file descriptor, the lock is held until it is
+    closed or the process exits. Returns None if another process holds the lock."""
+    fd = os.open(lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+
+    return fd
+
+
+class PeriodicTask(threading.Thread):
+    """Run a function periodically in the app context of a background thread.
+    If a lock file is given, only the process holding the lock runs the task (e.g. one of several gunicorn workers)."""
+
+    def __init__(self, app, name: str, function, interval: float, lock_file: str | None = None) -> None:
+        super().__init__(name=name, daemon=True)
+        self.app = app
+        self.function = function
+        self.interval = interval
+        self.lock_file = lock_file
+        self.lock_fd: int | None = None
+
+    def acquire(self) -> bool:
+        if self.lock_file is None or self.lock_fd is not None:
+            return True
+
+        if (fd := try_lock(self.lock_file)) is None:
+            return False
+
+        # the lock is held until the process exits
+        self.lock_fd = fd
+        self.app.logger.info("Running %s in process %s", self.name, os.getpid())
+        return True
+
+    def run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+
+            if not self.acquire():
+                continue
+
+            try:
+                with self.app.app_context():
+                    self.function()
+            except Exception:
+                self.app.logger.exception("Task %s failed. Retrying...", self.name)
+
+
+def start_task(app, name: str, function, interval: float) -> PeriodicTask | None:
+    """Start a periodic task in one process only. Tasks are not started in testing mode"""
+    if app.config["TESTING"]:
+        return None
+
+    os.makedirs(app.instance_path, exist_ok=True)
+    task = PeriodicTask(app, name, function, interval, os.path.join(app.instance_path, f"{name}.lock"))
+    task.start()
+    return task
@@ -0,0 +1,69 @@
+import glob
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from flask import current_app as app
+
+from .models import db
+
+
+def backup_database(source: str, target: str) -> None:
+    """Copy a sqlite database with VACUUM INTO and verify the copy.
+    The copy is a snapshot of a single read transaction, in WAL mode writers continue while it is written. It is
+    written to a temporary file and only renamed to target if it is valid."""
+    tmp_target = f"{target}.tmp"
+
+    if os.path.exists(tmp_target):
+        os.remove(tmp_target)  # left over by an interrupted backup, VACUUM INTO needs a new file
+
+    src = sqlite3.connect(source)
+    try:
+        src.execute("VACUUM INTO ?", (tmp_target,))
+    finally:
+        src.close()
+
+    dst = sqlite3.connect(tmp_target)
+    try:
+        result = dst.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        dst.close()
+
+    if result != "ok":
+        os.remove(tmp_target)
+        msg = f"Backup of {source} is corrupt: {result}"
+        raise sqlite3.DatabaseError(msg)
+
+    os.replace(tmp_target, target)
+
+
+def remove_old_backups(pattern: str, keep: int) -> None:
+    for old in sorted(glob.glob(pattern))[:-keep]:
+        os.remove(old)
+
+
+def backup_all() -> list[str]:
+    """Backup the live and archive database to BACKUP_DIR, keeping the newest BACKUP_KEEP backups of each.
+    Returns the names of the written backups."""
+    backup_dir = os.path.join(app.instance_path, app.config["BACKUP_DIR"])
+    os.makedirs(backup_dir, exist_ok=True)
+
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    backups = []
+
+    for engine in db.engines.values():
+        if not (source := engine.url.database) or not os.path.isfile(source):
+            continue  # in-memory or not yet created
+
+        stem, ext = os.path.splitext(os.path.basename(source))
+        target = os.path.join(backup_dir, f"{stem}-{timestamp}{ext}")
+
+        start = time.perf_counter()
+        backup_database(source, target)
+        app.logger.info("Backup of %s written to %s in %.2fs", source, target, time.perf_counter() - start)
+
+        remove_old_backups(os.path.join(backup_dir, f"{stem}-[0-9]*-[0-9]*{ext}"), app.config["BACKUP_KEEP"])
+        backups.append(target)
+
+    return backups
@@ -0,0 +1,89 @@
+"""Cache for rendered responses that only change with the state of the database.
+
+Entries are stored by key (e.g. the bar) together with the state version they were rendered for. Only one thread per
+key renders a new version, concurrent requests wait for it and reuse the result. Optionally, entries are shared
+between workers with a sqlite file. Rendering into the file holds its write lock, so a version is rendered once by
+all workers together.
+"""
+
+import os
+import sqlite3
+import threading
+from collections.abc import Callable
+
+CACHE_TIMEOUT = 5  # seconds to wait for another worker rendering
+
+
+class ResponseCache:
+    def __init__(self, path: str | None = None) -> None:
+        self.path = path
+        self.entries: dict[str, tuple[str, str]] = {}
+        self.locks: dict[str, threading.Lock] = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+        if path is not None:
+            connection = self.connection()
+            connection.execute("PRAGMA journal_mode=WAL")  # readers do not wait for a worker rendering
+            connection.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, version TEXT, body TEXT)")
+
+    def reset_connections(self) -> None:
+        """Forget connections inherited from the parent process after a fork"""
+        self.local = threading.local()
+
+    def key_lock(self, key: str) -> threading.Lock:
+        with self.lock:
+            return self.locks.setdefault(key, threading.Lock())
+
+    def connection(self) -> sqlite3.Connection:
+        if getattr(self.local, "connection", None) is None:
+            self.local.connection = sqlite3.connect(self.path, timeout=CACHE_TIMEOUT, isolation_level=None)
+        return self.local.connection
+
+    def render_shared(self, key: str, version: str, render: Callable[[], str]) -> str:
+        connection = self.connection()
+
+        row = connection.execute("SELECT version, body FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None and row[0] == version:
+            return row[1]
+
+        # Other workers block here until the body is stored and find it afterwards
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT version, body FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] == version:
+                body = row[1]
+            else:
+                body = render()
+                connection.execute("REPLACE INTO responses (key, version, body) VALUES (?, ?, ?)", (key, version, body))
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+        connection.execute("COMMIT")
+        return body
+
+    def get(self, key: str, version: str, render: Callable[[], str]) -> str:
+        """Return the body for key in the given version, render is called if it is not cached yet"""
+        if (entry := self.entries.get(key)) is not None and entry[0] == version:
+            return entry[1]
+
+        with self.key_lock(key):
+            # Another thread may have rendered this version while waiting for the lock
+            if (entry := self.entries.get(key)) is not None and entry[0] == version:
+                return entry[1]
+
+            body = render() if self.path is None else self.render_shared(key, version, render)
+            self.entries[key] = (version, body)
+            return body
+
+
+def init_cache(app) -> None:
+    path = app.config["RESPONSE_CACHE_FILE"]
+
+    if path is not None:
+        os.makedirs(app.instance_path, exist_ok=True)
+        path = os.path.join(app.instance_path, path)
+        app.logger.info("Sharing rendered responses between workers in %s", path)
+
+    app.extensions["minipos_response_cache"] = ResponseCache(path)
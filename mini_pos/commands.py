@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app as app
+from flask.cli import with_appcontext
+
+from .assets import ASSETS_DIR, build_assets
+from .background import start_task
+from .backup import backup_all
+from .export import EXPORT_FORMATS, EXPORT_KINDS, export, parquet_available
+from .models import archive_orders
+
+ARCHIVE_BATCH_SIZE = 500  # orders per transaction
+ARCHIVE_INTERVAL = 10 * 60  # seconds between automatic archive runs
+ARCHIVE_AFTER_DEFAULT = 120  # minutes
+
+
+@click.command("archive")
+@click.option("--older-than", type=int, help="archive orders completed more than n minutes ago")
+@click.option("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, show_default=True, help="orders per transaction")
+@with_appcontext
+def archive_command(older_than: int | None, batch_size: int) -> None:
+    """Move completed orders to the archive database"""
+    if older_than is None:
+        older_than = int(app.config["ARCHIVE_AFTER"] or ARCHIVE_AFTER_DEFAULT)
+
+    count = archive_orders(datetime.now() - timedelta(minutes=older_than), batch_size)
+    click.echo(f"Archived {count} orders to {app.config['ARCHIVE_DATABASE_FILE']}")
+
+
+@click.command("backup")
+@with_appcontext
+def backup_command() -> None:
+    """Backup the databases while the server is running"""
+    for backup in backup_all():
+        click.echo(f"Backup written to {backup}")
+
+
+@click.command("export")
+@click.argument("kind", type=click.Choice(EXPORT_KINDS))
+@click.option("--format", "fmt", type=click.Choice(EXPORT_FORMATS), default="csv", show_default=True)
+@click.option("--from", "start", type=click.DateTime(), help="only orders created at or after this time")
+@click.option("--to", "end", type=click.DateTime(), help="only orders created before this time")
+@click.option("-o", "--output", default="-", help="output file, default stdout")
+@with_appcontext
+def export_command(kind: str, fmt: str, start: datetime | None, end: datetime | None, output: str) -> None:
+    """Export orders or products including the archive"""
+    if fmt == "parquet" and not parquet_available():
+        msg = "Parquet export requires pyarrow"
+        raise click.ClickException(msg)
+
+    with click.open_file(output, "wb") as afile:
+        for chunk in export(kind, fmt, start, end):
+            afile.write(chunk)
+
+
+@click.command("assets")
+@with_appcontext
+def assets_command() -> None:
+    """Build fingerprinted and compressed static files"""
+    manifest = build_assets(app.static_folder)
+    click.echo(f"Wrote {len(manifest)} files to {app.static_folder}/{ASSETS_DIR}")
+
+
+def archive_task() -> None:
+    archive_orders(datetime.now() - timedelta(minutes=int(app.config["ARCHIVE_AFTER"])), ARCHIVE_BATCH_SIZE)
+
+
+def register_commands(app) -> None:
+    app.cli.add_command(archive_command)
+    app.cli.add_command(assets_command)
+    app.cli.add_command(backup_command)
+    app.cli.add_command(export_command)
+
+
+def init_tasks(app) -> None:
+    if app.config["ARCHIVE_AFTER"] is not None:
+        app.logger.info("Archiving orders completed more than %s minutes ago", app.config["ARCHIVE_AFTER"])
+        start_task(app, "archive", archive_task, ARCHIVE_INTERVAL)
+
+    if app.config["BACKUP_INTERVAL"] is not None:
+        app.logger.info("Backing up databases every %s minutes", app.config["BACKUP_INTERVAL"])
+        start_task(app, "backup", backup_all, int(app.config["BACKUP_INTERVAL"]) * 60)
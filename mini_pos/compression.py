@@ -0,0 +1,53 @@
+"""Compress html and json responses for clients that accept it"""
+
+import gzip
+
+from flask import request
+
+try:
+    import brotli  # optional, gzip is used if it is not installed
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = 500  # bytes, smaller responses are not worth the overhead
+COMPRESS_LEVEL = 6  # gzip level, higher levels are much slower for little gain
+BROTLI_QUALITY = 5  # brotli quality for dynamic responses
+COMPRESS_MIMETYPES = {"text/html", "application/json", "text/css", "text/javascript", "application/javascript"}
+ENCODINGS = ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def compress(data: bytes, encoding: str, level: int | None = None) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY if level is None else level)
+    return gzip.compress(data, COMPRESS_LEVEL if level is None else level, mtime=0)
+
+
+def compress_response(response):
+    if (
+        response.direct_passthrough  # files, precompressed variants are served for static assets
+        or response.is_streamed
+        or response.status_code != 200
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESS_MIMETYPES
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE or (encoding := request.accept_encodings.best_match(ENCODINGS)) is None:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+
+    # The compressed body differs from the uncompressed one, but the content is equivalent
+    etag, weak = response.get_etag()
+    if etag is not None and not weak:
+        response.set_etag(etag, weak=True)
+
+    return response
+
+
+def init_compression(app) -> None:
+    app.after_request(compress_response)
@@ -2,16 +2,23 @@ import json
 import logging
 import os
 import sys
+import threading
+import time
 from typing import Any
 
 from flask import current_app as app
+from flask import request
 
 from .confcheck import LogLevel, check_config_base
+from .models import CatalogItem, ConfigRevision, db
+from .printing import start_print_workers
 
-ProductsT = dict[int, tuple[str, float, int]]
+ProductsT = dict[int, tuple[str, int, str]]  # id -> name, price in cents, category
 TablesGridTupleT = tuple[bool, int | None, int | None, str | None]
 TablesGridT = list[list[TablesGridTupleT | None]]
 
+CONFIG_CHECK_INTERVAL = 1  # seconds between checks for new config revisions per worker
+
 # Key: name
 # Value: Datatype (origin), mandatory (bool), sub-config (dict)
 # If sub-config is tuple, this means any-of
@@ -20,6 +27,8 @@ CONFIG_DICT: dict[str, tuple] = {
     "products": (dict[str, list[tuple[str, float]]], True, None),
     # Bars
     "bars": (dict[str, list[str]], False, None),
+    # Printers per bar
+    "printers": (dict[str, str], False, None),
     # Tables
     "tables": (
         dict,
@@ -118,12 +127,18 @@ class UIConfig:
 
 class MiniPOSConfig:
     def __init__(self, config_data: dict) -> None:
-        self.products = dict(
-            enumerate(
-                [(prod[0], prod[1], cat) for cat, prods in config_data["products"].items() for prod in prods], start=1
-            )
-        )
+        # Prices are given in euros, but stored and computed in integer cents to avoid rounding errors
+        self.product_list = [
+            (prod[0], round(prod[1] * 100), cat) for cat, prods in config_data["products"].items() for prod in prods
+        ]
         self.categories = list(config_data["products"].keys())
+
+        if len({name for name, _, _ in self.product_list}) != len(self.product_list):
+            app.logger.critical("Duplicate product name found. Product names must be unique")
+
+        # Product ids are positions until catalog ids are assigned by load_catalog
+        self.products: ProductsT = dict(enumerate(self.product_list, start=1))
+        self.bar_products: dict[str, set[int]] = {}
         self.bars = config_data.get("bars", {})
         self.tables: TableConfig = TableConfig(config_data["tables"])
         self.ui: UIConfig = UIConfig(config_data.get("ui", {}))
@@ -135,6 +150,33 @@ class MiniPOSConfig:
 
         # merge default config with user defined bars if enabled
         self.bars |= {"default": self.categories} if self.ui.bar.default else {}
+        self.set_catalog({pid: (name, category) for pid, (name, _, category) in self.products.items()})
+
+        self.printers: dict[str, str] = config_data.get("printers", {})
+
+        for bar, target in self.printers.items():
+            if bar not in self.bars:
+                app.logger.critical("Printer configured for unknown bar %s", bar)
+            if not target.startswith(("file://", "tcp://")):
+                app.logger.critical("Invalid printer %s for bar %s. Must start with file:// or tcp://", target, bar)
+
+    def set_catalog(self, catalog: dict[int, tuple[str, str]]) -> None:
+        """Use catalog ids (id -> name, category) for products. Bars include all catalog items of their categories,
+        including items removed from the config which may still be part of open orders."""
+        ids = {name: catalog_id for catalog_id, (name, _) in catalog.items()}
+        self.products = {ids[name]: (name, price, category) for name, price, category in self.product_list}
+        self.bar_products = {
+            bar: {catalog_id for catalog_id, (_, category) in catalog.items() if category in categories}
+            for bar, categories in self.bars.items()
+        }
+
+
+def load_catalog(minipos_config: MiniPOSConfig) -> None:
+    """Add the products of a config to the catalog and assign their catalog ids"""
+    CatalogItem.sync(minipos_config.product_list)
+    db.session.commit()
+
+    minipos_config.set_catalog({item.id: (item.name, item.category) for item in CatalogItem.get_all()})
 
 
 def load_file(config_file: str) -> dict | None:
@@ -152,10 +194,9 @@ def load_file(config_file: str) -> dict | None:
             return None
 
 
-def init_config(app):
-    # Check if config file exists and has no json errors
-    if (config_data := load_file(app.config["CONFIG_FILE"])) is None:
-        sys.exit(1)
+def parse_config(config_data: dict) -> tuple[MiniPOSConfig | None, int]:
+    """Validate config data and build the config object. Errors are logged.
+    Returns the config object or None and an error code if the config is invalid."""
 
     # Check if config conforms to correct structure
     log_lookup = {
@@ -172,15 +213,12 @@ def init_config(app):
         for msg, fun in check_result:
             log_lookup[fun](msg)
 
-        sys.exit(2)
-
-    # debug setting also used for flask
-    app.config["DEBUG"] = config_data.get("debug", app.config["DEBUG"])
+        return None, 2
 
     # Make sure that no table is named "login" as this breaks login functionality in service
     if any(x[4] == "login" for x in config_data["tables"]["names"]):
         app.logger.critical("Table name 'login' is prohibited.")
-        sys.exit(3)
+        return None, 3
 
     # Get the crit log count handler to use
     crit_log_count_handler = next((x for x in app.logger.handlers if x.name == "CritLogCountHandler"), None)
@@ -189,13 +227,147 @@ def init_config(app):
     # Initialize config object from json
     _ = crit_log_count_handler.count  # reset counter
 
-    app.config["minipos"] = MiniPOSConfig(config_data)
+    minipos_config = MiniPOSConfig(config_data)
 
     if crit_log_count_handler.count != 0:
-        sys.exit(4)
+        return None, 4
 
-    # adapt log setting
-    if app.config["DEBUG"]:
+    return minipos_config, 0
+
+
+def set_log_level(app, *, debug: bool) -> None:
+    if debug:
         app.logger.setLevel(logging.DEBUG)
     else:
         app.logger.setLevel(logging.INFO)
+
+
+def init_config(app):
+    # Check if config file exists and has no json errors
+    if (config_data := load_file(app.config["CONFIG_FILE"])) is None:
+        sys.exit(1)
+
+    # MiniPOSConfig modifies the data, keep the original for the config revision
+    # Keys must not be sorted, product ids depend on the order of categories
+    config_json = json.dumps(config_data, ensure_ascii=False)
+
+    minipos_config, error = parse_config(config_data)
+
+    if minipos_config is None:
+        sys.exit(error)
+
+    # debug setting also used for flask
+    app.config["DEBUG"] = config_data.get("debug", app.config["DEBUG"])
+    app.config["minipos"] = minipos_config
+
+    # version is set by init_config_reload when the database is available
+    # seen is the latest invalid revision, it is not loaded again
+    app.extensions["minipos_config"] = {
+        "version": 0,
+        "seen": 0,
+        "json": config_json,
+        "checked": 0.0,
+        "lock": threading.Lock(),
+    }
+
+    # adapt log setting
+    set_log_level(app, debug=app.config["DEBUG"])
+
+
+def reload_config(app) -> int | None:
+    """Load the config file and publish it to all workers. Returns the new version or None if the config is invalid"""
+    if (config_data := load_file(app.config["CONFIG_FILE"])) is None:
+        return None
+
+    config_json = json.dumps(config_data, ensure_ascii=False)
+    minipos_config, _ = parse_config(config_data)
+
+    if minipos_config is None:
+        app.logger.error("Invalid config file. Keeping current config...")
+        return None
+
+    load_catalog(minipos_config)
+    version = ConfigRevision.add(config_json)
+    db.session.commit()
+
+    # swap in the already built config, other workers build it on their next request
+    set_log_level(app, debug=config_data.get("debug", app.config["DEBUG"]))
+    app.config["minipos"] = minipos_config
+    app.extensions["minipos_config"] |= {"version": version, "json": config_json}
+    start_print_workers(app)
+
+    app.logger.info("Reloaded config (version %s)", version)
+    return version
+
+
+def check_config_version() -> None:
+    if request.endpoint == "static":
+        return
+
+    load_latest_config()
+
+
+def load_latest_config() -> None:
+    """Swap in a newer config revision published by another worker. The database is checked at most every
+    CONFIG_CHECK_INTERVAL seconds and only by one thread at a time."""
+    state = app.extensions["minipos_config"]
+    now = time.monotonic()
+
+    if now - state["checked"] < CONFIG_CHECK_INTERVAL or not state["lock"].acquire(blocking=False):
+        return
+
+    try:
+        state["checked"] = now
+
+        # cheap check for the common case, the revision itself is only read if it changed
+        if ConfigRevision.get_latest_version() in (state["version"], state["seen"]):
+            return
+
+        if (revision := ConfigRevision.get_latest()) is None:
+            return
+
+        # revision was validated by the publishing worker, but better safe than sorry
+        config_data = json.loads(revision.data)
+        minipos_config, _ = parse_config(config_data)
+
+        if minipos_config is None:
+            app.logger.error("Invalid config revision %s. Keeping current config...", revision.id)
+            state["seen"] = revision.id
+            return
+
+        load_catalog(minipos_config)
+        set_log_level(app, debug=config_data.get("debug", app.config["DEBUG"]))
+        app.config["minipos"] = minipos_config
+
+        # only published after the swap, views cached for this version must be rendered with the new config
+        state |= {"version": revision.id, "json": revision.data}
+        start_print_workers(app)
+
+        app.logger.info("Loaded new config (version %s)", revision.id)
+    finally:
+        state["lock"].release()
+
+
+def init_config_reload(app) -> None:
+    """Assign catalog ids, publish the config file as config revision if it differs from the latest one
+    and watch for new revisions"""
+    state = app.extensions["minipos_config"]
+    load_catalog(app.config["minipos"])
+    latest = ConfigRevision.get_latest()
+
+    if latest is None or latest.data != state["json"]:
+        state["version"] = ConfigRevision.add(state["json"])
+        db.session.commit()
+    else:
+        state["version"] = latest.id
+
+    app.before_request(check_config_version)
+
+    # Clients compare this to the version they were rendered with and reload on changes
+    app.after_request(add_config_version_header)
+    app.context_processor(lambda: {"config_version": app.extensions["minipos_config"]["version"]})
+
+
+def add_config_version_header(response):
+    response.headers["X-Config-Version"] = str(app.extensions["minipos_config"]["version"])
+    return response
@@ -0,0 +1,174 @@
+"""Export orders and products as csv or parquet.
+
+Rows are read from the archive and the live database in chunks and written out chunk by chunk, memory usage does not
+depend on the size of the database. Prices are exported as integer cents.
+"""
+
+import csv
+import io
+from collections.abc import Iterator
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from .models import CatalogItem, Order, Product, db
+
+EXPORT_CHUNK_SIZE = 10000  # rows per chunk, also the parquet row group size
+EXPORT_KINDS = ("orders", "products")
+EXPORT_FORMATS = ("csv", "parquet")
+
+# Column names and parquet types
+COLUMNS = {
+    "orders": [
+        ("order_id", "int64"),
+        ("date", "timestamp"),
+        ("completed_at", "timestamp"),
+        ("waiter", "string"),
+        ("table", "string"),
+        ("items", "int64"),
+        ("total", "int64"),
+    ],
+    "products": [
+        ("product_id", "int64"),
+        ("order_id", "int64"),
+        ("date", "timestamp"),
+        ("completed_at", "timestamp"),
+        ("waiter", "string"),
+        ("table", "string"),
+        ("name", "string"),
+        ("category", "string"),
+        ("price", "int64"),
+        ("amount", "int64"),
+        ("comment", "string"),
+        ("completed", "bool"),
+    ],
+}
+
+
+def export_query(kind: str, start: datetime | None, end: datetime | None):
+    """Query for all orders or products of orders created between start and end"""
+    if kind == "orders":
+        query = (
+            select(
+                Order.id,
+                Order.date,
+                Order.completed_at,
+                Order.waiter,
+                Order.table,
+                func.coalesce(func.sum(Product.amount), 0),
+                func.coalesce(func.sum(Product.price * Product.amount), 0),
+            )
+            .outerjoin(Order.products)
+            .group_by(Order.id)
+            .order_by(Order.id)
+        )
+    else:
+        query = (
+            select(
+                Product.id,
+                Order.id,
+                Order.date,
+                Order.completed_at,
+                Order.waiter,
+                Order.table,
+                CatalogItem.name,
+                CatalogItem.category,
+                Product.price,
+                Product.amount,
+                Product.comment,
+                Product.completed,
+            )
+            .join(Product.order)
+            .join(Product.item)
+            .order_by(Product.id)
+        )
+
+    if start is not None:
+        query = query.filter(Order.date >= start)
+    if end is not None:
+        query = query.filter(Order.date < end)
+
+    return query
+
+
+def iter_chunks(kind: str, start: datetime | None, end: datetime | None, chunk_size: int) -> Iterator[list[tuple]]:
+    query = export_query(kind, start, end)
+
+    # The archive contains the older orders. Both databases use the same table names, the query works for both
+    engines = [engine for engine in (db.engines.get("archive"), db.engine) if engine is not None]
+
+    for engine in engines:
+        with engine.connect() as connection:
+            result = connection.execution_options(yield_per=chunk_size).execute(query)
+            for partition in result.partitions():
+                yield [tuple(row) for row in partition]
+
+
+def iter_csv(kind: str, start: datetime | None, end: datetime | None) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in COLUMNS[kind]])
+
+    for chunk in iter_chunks(kind, start, end, EXPORT_CHUNK_SIZE):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()  # header only
+
+
+class ChunkSink(io.RawIOBase):
+    """Writable file collecting the output of the parquet writer until it is taken"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.chunks: list[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_parquet(kind: str, start: datetime | None, end: datetime | None) -> Iterator[bytes]:
+    import pyarrow as pa  # optional, only needed for parquet export
+    import pyarrow.parquet as pq
+
+    types = {"int64": pa.int64(), "timestamp": pa.timestamp("us"), "string": pa.string(), "bool": pa.bool_()}
+    schema = pa.schema([(name, types[dtype]) for name, dtype in COLUMNS[kind]])
+
+    sink = ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for chunk in iter_chunks(kind, start, end, EXPORT_CHUNK_SIZE):
+            columns = [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), schema, strict=True)]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            yield sink.take()
+
+    yield sink.take()
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def export(kind: str, fmt: str, start: datetime | None = None, end: datetime | None = None) -> Iterator[bytes]:
+    """Iterate over the encoded export file. Requires an app context for the whole iteration"""
+    return iter_parquet(kind, start, end) if fmt == "parquet" else iter_csv(kind, start, end)
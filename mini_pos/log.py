@@ -1,4 +1,10 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
+from collections import Counter
+from datetime import datetime
 
 from flask.logging import default_handler
 
@@ -12,18 +18,48 @@ class CustomFormatter(logging.Formatter):
 
     format_str = "*** %(levelname)s *** %(message)s"
 
-    FORMATS: dict = {
-        logging.DEBUG: cyan + format_str + reset,
-        logging.INFO: green + format_str + reset,
-        logging.WARNING: yellow + format_str + reset,
-        logging.ERROR: red + format_str + reset,
-        logging.CRITICAL: red + format_str + reset,
+    FORMATTERS: dict = {
+        logging.DEBUG: logging.Formatter(cyan + format_str + reset),
+        logging.INFO: logging.Formatter(green + format_str + reset),
+        logging.WARNING: logging.Formatter(yellow + format_str + reset),
+        logging.ERROR: logging.Formatter(red + format_str + reset),
+        logging.CRITICAL: logging.Formatter(red + format_str + reset),
     }
 
     def format(self, record) -> str:
-        log_fmt = self.FORMATS.get(record.levelno)
-        formatter = logging.Formatter(log_fmt)
-        return formatter.format(record)
+        return self.FORMATTERS.get(record.levelno, self.FORMATTERS[logging.CRITICAL]).format(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """One json object per line for log processing"""
+
+    def format(self, record) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "pid": record.process,
+            "message": record.getMessage(),
+        }
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Only pass every nth debug record of a logger, counted per message.
+    Used for high frequency lines like the fetch routes which are polled every few seconds."""
+
+    def __init__(self, rates: dict[str, int]) -> None:
+        super().__init__()
+        self.rates = rates
+        self.counter: Counter = Counter()
+
+    def filter(self, record) -> bool:
+        if record.levelno > logging.DEBUG or (rate := self.rates.get(record.name, 1)) <= 1:
+            return True
+
+        key = (record.name, record.msg)
+        self.counter[key] += 1
+        return self.counter[key] % rate == 1
 
 
 class LogCount(logging.Handler):
@@ -44,15 +80,69 @@ class LogCount(logging.Handler):
 
 
 def init_logging(app) -> None:
+    # Records are put in a queue and written by a separate thread so that requests never block on output
+    # app.logger is shared between app instances, remove handlers of previous instances first
+    for old in [x for x in app.logger.handlers if x.name in ("QueueHandler", "CritLogCountHandler")]:
+        app.logger.removeHandler(old)
+        if isinstance(old, logging.handlers.QueueHandler):
+            old.listener.stop()
+            atexit.unregister(old.listener.stop)
+
     handler = logging.StreamHandler()
     handler.setFormatter(CustomFormatter())
     handler.setLevel(logging.DEBUG)
     handler.name = "StreamHandler"
 
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # flush remaining records, e.g. on sys.exit for invalid configs
+
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.name = "QueueHandler"
+    queue_handler.listener = listener
+
+    # Counting must be synchronous, init_config checks the count directly after logging
     counter = LogCount()
     counter.setLevel(logging.CRITICAL)
     counter.name = "CritLogCountHandler"
 
     app.logger.removeHandler(default_handler)
-    app.logger.addHandler(handler)
+    app.logger.addHandler(queue_handler)
     app.logger.addHandler(counter)
+
+
+def restart_logging(app) -> None:
+    """Start a new listener thread for the log queue, e.g. in a forked worker process"""
+    queue_handler = next(x for x in app.logger.handlers if x.name == "QueueHandler")
+    old = queue_handler.listener
+    old.stop()  # returns immediately if the thread did not survive a fork
+    atexit.unregister(old.stop)
+
+    # records of the parent process left in the old queue are written by the parent
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *old.handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    queue_handler.queue = log_queue
+    queue_handler.listener = listener
+
+
+def configure_logging(app) -> None:
+    """Add log outputs depending on the app configuration"""
+    queue_handler = next(x for x in app.logger.handlers if x.name == "QueueHandler")
+
+    if sampling := app.config.get("LOG_SAMPLING"):
+        queue_handler.addFilter(SamplingFilter(sampling))
+
+    if filename := app.config.get("LOG_FILE"):
+        file_handler = logging.handlers.RotatingFileHandler(
+            filename, maxBytes=10 * 1024 * 1024, backupCount=5, encoding="utf-8"
+        )
+        file_handler.setFormatter(JsonFormatter())
+        file_handler.setLevel(logging.DEBUG)
+        file_handler.name = "FileHandler"
+
+        queue_handler.listener.handlers += (file_handler,)
+        app.logger.info("Logging to %s", filename)
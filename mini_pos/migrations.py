@@ -0,0 +1,117 @@
+"""Schema migrations for existing databases.
+
+The schema version is stored in the sqlite user_version. New databases are created with the current schema by
+create_all and start at the latest version. Migrations use plain sql with the schema of their time, so they do not
+change when the models change.
+"""
+
+import logging
+
+from sqlalchemy import inspect
+
+logger = logging.getLogger(__name__)
+
+
+def rebuild_table(connection, name: str, create: str, select: str) -> None:
+    """Change the schema of a table by creating a new one filled with the result of select.
+    create is the column definition, select reads from the old table."""
+    connection.exec_driver_sql(f"CREATE TABLE {name}_new ({create})")
+    connection.exec_driver_sql(f"INSERT INTO {name}_new {select}")
+    connection.exec_driver_sql(f"DROP TABLE {name}")
+    connection.exec_driver_sql(f"ALTER TABLE {name}_new RENAME TO {name}")
+
+
+def catalog_ids(connection) -> None:
+    """Move product names, categories and prices to the catalog table, products reference it by id"""
+    connection.exec_driver_sql(
+        "CREATE TABLE catalog (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR UNIQUE, category VARCHAR, price FLOAT)"
+    )
+    # use the latest category and price of every product, both are updated from the config on startup
+    connection.exec_driver_sql(
+        "INSERT INTO catalog (name, category, price) SELECT name, category, price FROM products "
+        "WHERE id IN (SELECT max(id) FROM products GROUP BY name) ORDER BY id"
+    )
+
+    rebuild_table(
+        connection,
+        "products",
+        "id INTEGER NOT NULL PRIMARY KEY, order_id INTEGER REFERENCES orders (id), "
+        "catalog_id INTEGER REFERENCES catalog (id), price FLOAT, amount INTEGER, comment VARCHAR, completed BOOLEAN",
+        "SELECT p.id, p.order_id, c.id, p.price, p.amount, p.comment, p.completed "
+        "FROM products p JOIN catalog c ON c.name = p.name",
+    )
+
+    if inspect(connection).has_table("stock"):
+        # quotas can be set for products that were never ordered
+        connection.exec_driver_sql("INSERT OR IGNORE INTO catalog (name) SELECT name FROM stock")
+        rebuild_table(
+            connection,
+            "stock",
+            "catalog_id INTEGER NOT NULL PRIMARY KEY REFERENCES catalog (id), remaining INTEGER",
+            "SELECT c.id, s.remaining FROM stock s JOIN catalog c ON c.name = s.name",
+        )
+
+
+def integer_cents(connection) -> None:
+    """Store prices and revenue as integer cents. Columns are recreated as sqlite keeps floats in FLOAT columns"""
+    rebuild_table(
+        connection,
+        "catalog",
+        "id INTEGER NOT NULL PRIMARY KEY, name VARCHAR UNIQUE, category VARCHAR, price INTEGER",
+        "SELECT id, name, category, CAST(round(price * 100) AS INTEGER) FROM catalog",
+    )
+    rebuild_table(
+        connection,
+        "products",
+        "id INTEGER NOT NULL PRIMARY KEY, order_id INTEGER REFERENCES orders (id), "
+        "catalog_id INTEGER REFERENCES catalog (id), price INTEGER, amount INTEGER, comment VARCHAR, completed BOOLEAN",
+        "SELECT id, order_id, catalog_id, CAST(round(price * 100) AS INTEGER), amount, comment, completed "
+        "FROM products",
+    )
+
+    if inspect(connection).has_table("statistics"):
+        rebuild_table(
+            connection,
+            "statistics",
+            'kind VARCHAR NOT NULL, "key" VARCHAR NOT NULL, orders INTEGER, items INTEGER, revenue INTEGER, '
+            'completed INTEGER, completion_time FLOAT, PRIMARY KEY (kind, "key")',
+            'SELECT kind, "key", orders, items, CAST(round(revenue * 100) AS INTEGER), completed, completion_time '
+            "FROM statistics",
+        )
+
+    if inspect(connection).has_table("rollups"):
+        rebuild_table(
+            connection,
+            "rollups",
+            "bucket DATETIME NOT NULL, bar VARCHAR NOT NULL, orders INTEGER, items INTEGER, revenue INTEGER, "
+            "completions INTEGER, completion_time FLOAT, PRIMARY KEY (bucket, bar)",
+            "SELECT bucket, bar, orders, items, CAST(round(revenue * 100) AS INTEGER), completions, completion_time "
+            "FROM rollups",
+        )
+
+
+def open_products_index(connection) -> None:
+    """Covering index for the pick list"""
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_products_open ON products (completed, catalog_id, comment, amount)"
+    )
+
+
+# Append only, the position in this list is the schema version
+MIGRATIONS = [catalog_ids, integer_cents, open_products_index]
+
+
+def migrate(engine) -> None:
+    """Bring the database to the latest schema version"""
+    with engine.begin() as connection:
+        version = connection.exec_driver_sql("PRAGMA user_version").scalar_one()
+
+        if not inspect(connection).has_table("products"):
+            # New database, tables are created with the current schema
+            connection.exec_driver_sql(f"PRAGMA user_version = {len(MIGRATIONS)}")
+            return
+
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            logger.info("Migrating database to version %s (%s)", number, migration.__name__)
+            migration(connection)
+            connection.exec_driver_sql(f"PRAGMA user_version = {number}")
@@ -2,16 +2,20 @@ from __future__ import annotations  # required for type hinting of classes in it
 
 import os.path
 from datetime import datetime, timedelta
+from functools import partial
 
 from flask import current_app as app
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import case, func
+from sqlalchemy import case, event, func, update
+from sqlalchemy.dialects.sqlite import insert
+
+from .migrations import migrate
 
 db = SQLAlchemy()
 
 
-class Order(db.Model):
-    __tablename__ = "orders"
+class OrderMixin:
+    """Columns and display logic shared by live and archived orders"""
 
     id = db.Column(db.Integer, primary_key=True)
     nonce = db.Column(db.Integer)
@@ -20,33 +24,6 @@ class Order(db.Model):
     date = db.Column(db.DateTime)
     completed_at = db.Column(db.DateTime)
 
-    products = db.relationship("Product", back_populates="order")
-
-    @classmethod
-    def create(cls, waiter: str, table: str, nonce: int) -> Order:
-        return cls(waiter=waiter, table=table, nonce=nonce, date=datetime.now(), completed_at=None)
-
-    @property
-    def active_since(self) -> str:
-        timediff = datetime.now() - self.date
-        if timediff > timedelta(minutes=60):
-            return ">60min"
-
-        seconds_aligned = timediff.seconds // 5 * 5  # align by 5 seconds (easy way to circumvent javascript timers)
-        seconds = str(seconds_aligned % 60).rjust(2, "0")
-        minutes = str(seconds_aligned // 60).rjust(2, "0")
-
-        return f"{minutes}:{seconds}"
-
-    @property
-    def active_since_timeout_class(self) -> str:
-        timediff = datetime.now() - self.date
-        if timediff > timedelta(seconds=app.config["minipos"].ui.bar.timeout_crit):
-            return "timeout_crit"
-        if timediff > timedelta(seconds=app.config["minipos"].ui.bar.timeout_warn):
-            return "timeout_warn"
-        return "timeout_ok"
-
     @property
     def completed_timestamp(self) -> str:
         if self.completed_at is None:
@@ -55,53 +32,62 @@ class Order(db.Model):
 
         return self.completed_at.strftime("%Y-%m-%d %H:%M:%S")
 
-    def complete(self) -> None:
+    def products_for_bar(self, bar: str) -> list:
+        return [p for p in self.products if p.catalog_id in app.config["minipos"].bar_products.get(bar, ())]
+
+
+class Order(OrderMixin, db.Model):
+    __tablename__ = "orders"
+
+    products = db.relationship("Product", back_populates="order")
+
+    @classmethod
+    def create(cls, waiter: str, table: str, nonce: int) -> Order:
+        return cls(waiter=waiter, table=table, nonce=nonce, date=datetime.now(), completed_at=None)
+
+    def complete(self, bar: str | None = None) -> None:
+        """Complete the order and all products. The caller commits"""
         for product in self.products:
-            product.complete()
+            product.complete(bar)
 
         self.completed_at = datetime.now()
-
-        db.session.commit()
+        record_order_completed(self, bar)
 
         app.logger.info("Completed order %s", self.id)
 
-    def products_for_bar(self, bar: str) -> list[Product]:
-        return [p for p in self.products if p.category in app.config["minipos"].bars.get(bar, [])]
-
     def complete_for_bar(self, bar: str) -> None:
+        """Complete the products of a bar and the order if nothing is left. The caller commits"""
         for product in self.products_for_bar(bar):
-            product.complete()
+            product.complete(bar)
 
         if not all(product.completed for product in self.products):
-            db.session.commit()
-
             app.logger.info("Partially completed order %s for bar %s", self.id, bar)
         else:
             self.completed_at = datetime.now()
-            db.session.commit()
+            record_order_completed(self, bar)
 
             app.logger.info("Completed order %s", self.id)
 
     @staticmethod
     def get_open_orders_for_bar(bar: str) -> list[Order]:
-        categories = app.config["minipos"].bars[bar]
+        catalog_ids = app.config["minipos"].bar_products[bar]
         return list(
             db.session.execute(
                 db.select(Order)
                 .join(Order.products)
-                .filter(Order.completed_at.is_(None), Product.category.in_(categories), Product.completed.is_(False))
+                .filter(Order.completed_at.is_(None), Product.catalog_id.in_(catalog_ids), Product.completed.is_(False))
                 .group_by(Order)
             ).scalars()
         )
 
     @staticmethod
     def get_partially_completed_order_for_bar(bar: str) -> list[Order]:
-        categories = app.config["minipos"].bars[bar]
+        catalog_ids = app.config["minipos"].bar_products[bar]
         return list(
             db.session.execute(
                 db.select(Order)
                 .join(Order.products)
-                .filter(Order.completed_at.is_(None), Product.category.in_(categories))
+                .filter(Order.completed_at.is_(None), Product.catalog_id.in_(catalog_ids))
                 .having(
                     func.sum(case((Product.completed.is_(False), 1), else_=0)) == 0
                 )  # do not try to simplify this, it will not work...
@@ -111,12 +97,12 @@ class Order(db.Model):
 
     @staticmethod
     def get_last_completed_orders_for_bar(bar: str) -> list[Order]:
-        categories = app.config["minipos"].bars[bar]
+        catalog_ids = app.config["minipos"].bar_products[bar]
         return list(
             db.session.execute(
                 db.select(Order)
                 .join(Order.products)
-                .filter(Order.completed_at.isnot(None), Product.category.in_(categories))
+                .filter(Order.completed_at.isnot(None), Product.catalog_id.in_(catalog_ids))
                 .group_by(Order)
                 .order_by(Order.completed_at.desc())
                 .limit(app.config["minipos"].ui.bar.show_completed)
@@ -124,25 +110,29 @@ class Order(db.Model):
         )
 
     @staticmethod
-    def get_all_completed_orders_for_bar(bar: str) -> list[Order]:
-        categories = app.config["minipos"].bars[bar]
+    def get_all_completed_orders_for_bar(bar: str) -> list[Order | ArchivedOrder]:
+        """Completed orders of the live database followed by the older ones of the archive"""
+        catalog_ids = app.config["minipos"].bar_products[bar]
         return list(
             db.session.execute(
                 db.select(Order)
                 .join(Order.products)
-                .filter(Order.completed_at.isnot(None), Product.category.in_(categories))
+                .filter(Order.completed_at.isnot(None), Product.catalog_id.in_(catalog_ids))
                 .group_by(Order)
                 .order_by(Order.completed_at.desc())
             ).scalars()
-        )
+        ) + ArchivedOrder.get_orders_for_bar(bar)
 
     @staticmethod
     def get_order_by_id(order_id: int) -> Order | None:
         return db.session.execute(db.select(Order).filter_by(id=order_id)).scalar_one_or_none()
 
     @staticmethod
-    def get_orders_by_table(table: str) -> list[Order]:
-        return list(db.session.execute(db.select(Order).filter_by(table=table).order_by(Order.id.desc())).scalars())
+    def get_orders_by_table(table: str) -> list[Order | ArchivedOrder]:
+        """Orders of the live database followed by the older ones of the archive"""
+        return list(
+            db.session.execute(db.select(Order).filter_by(table=table).order_by(Order.id.desc())).scalars()
+        ) + ArchivedOrder.get_orders_by_table(table)
 
     @staticmethod
     def get_open_orders_by_table(table: str) -> list[Order]:
@@ -157,36 +147,80 @@ class Order(db.Model):
         return list(db.session.execute(db.select(Order.table).filter_by(completed_at=None).distinct()).scalars())
 
 
-class Product(db.Model):
-    __tablename__ = "products"
+class CatalogItem(db.Model):
+    """Products ever defined in the config. Ids are stable, products of orders reference them.
+    Name, category and price are updated from the config, items removed from the config are kept."""
+
+    __tablename__ = "catalog"
 
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey(Order.id))
-    name = db.Column(db.String)
-    price = db.Column(db.Float)
+    name = db.Column(db.String, unique=True)
     category = db.Column(db.String)
+    price = db.Column(db.Integer)  # current price in cents, orders store the price at the time of ordering
+
+    @staticmethod
+    def sync(products: list[tuple[str, int, str]]) -> None:
+        """Insert or update products of the config (name, price in cents, category)"""
+        if not products:
+            return
+
+        stmt = insert(CatalogItem).values([{"name": n, "price": p, "category": c} for n, p, c in products])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CatalogItem.name],
+            set_={"price": stmt.excluded["price"], "category": stmt.excluded["category"]},
+        )
+        db.session.execute(stmt)
+
+    @staticmethod
+    def get_all() -> list[CatalogItem]:
+        return list(db.session.execute(db.select(CatalogItem).order_by(CatalogItem.id)).scalars())
+
+
+class ProductMixin:
+    """Columns and display logic shared by live and archived products"""
+
+    id = db.Column(db.Integer, primary_key=True)
+    price = db.Column(db.Integer)  # price in cents at the time of ordering
     amount = db.Column(db.Integer)
     comment = db.Column(db.String)
     completed = db.Column(db.Boolean)
 
+    @property
+    def name(self) -> str:
+        return self.item.name
+
+    @property
+    def category(self) -> str:
+        return self.item.category
+
+
+class Product(ProductMixin, db.Model):
+    __tablename__ = "products"
+    # covers the pick list query, open products are read from the index only
+    __table_args__ = (db.Index("ix_products_open", "completed", "catalog_id", "comment", "amount"),)
+
+    order_id = db.Column(db.Integer, db.ForeignKey(Order.id))
+    catalog_id = db.Column(db.Integer, db.ForeignKey(CatalogItem.id))
+
     order = db.relationship("Order", back_populates="products")
+    item = db.relationship(CatalogItem, lazy="joined")
 
     @classmethod
-    def create(cls, order_id: int, name: str, price: float, category: str, amount: int, comment="") -> Product:
+    def create(cls, order_id: int, catalog_id: int, price: int, amount: int, comment="") -> Product:
         return cls(
             order_id=order_id,
-            name=name,
+            catalog_id=catalog_id,
             price=price,
-            category=category,
             amount=amount,
             comment=comment,
             completed=False,
         )
 
-    def complete(self) -> None:
+    def complete(self, bar: str | None = None) -> None:
+        """Mark the product as completed. The caller commits, so that an order is completed in one transaction"""
         if not self.completed:
             self.completed = True
-            db.session.commit()
+            record_product_completed(self, bar)
             app.logger.info("Completed product %s", self.id)
 
     @staticmethod
@@ -201,10 +235,585 @@ class Product(db.Model):
     def get_open_product_lists_by_table(table: str) -> list[list[Product]]:
         return [Product.get_open_products_by_order_id(o.id) for o in Order.get_open_orders_by_table(table)]
 
+    @staticmethod
+    def get_pick_list(bar: str) -> list[dict]:
+        """Amounts of all open products of a bar by product and comment, in catalog order.
+        The list is cached per worker until the state version changes."""
+        key = get_state_version()
+        cache = app.extensions.setdefault("minipos_pick_lists", {})
+
+        if (cached := cache.get(bar)) is not None and cached[0] == key:
+            return cached[1]
+
+        # Names are read from the catalog, products removed from the config may still be open
+        rows = db.session.execute(
+            db.select(Product.catalog_id, CatalogItem.name, func.sum(Product.amount), Product.comment)
+            .join(CatalogItem, CatalogItem.id == Product.catalog_id)
+            .filter(Product.completed.is_(False), Product.catalog_id.in_(app.config["minipos"].bar_products[bar]))
+            .group_by(Product.catalog_id, Product.comment)
+            .order_by(Product.catalog_id, Product.comment)
+        ).all()
+
+        pick_list: dict[int, dict] = {}
+        for catalog_id, name, amount, comment in rows:
+            if (item := pick_list.get(catalog_id)) is None:
+                item = pick_list[catalog_id] = {"catalog_id": catalog_id, "name": name, "amount": 0, "comments": {}}
+
+            item["amount"] += amount
+            if comment:
+                item["comments"][comment] = amount
+
+        cache[bar] = (key, list(pick_list.values()))
+        return cache[bar][1]
+
+
+class ArchivedCatalogItem(db.Model):
+    """Copy of the catalog items referenced by archived products"""
+
+    __bind_key__ = "archive"
+    __tablename__ = "catalog"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    category = db.Column(db.String)
+    price = db.Column(db.Integer)
+
+
+class ArchivedOrder(OrderMixin, db.Model):
+    """Completed orders moved to the archive database. Tables have the same names and columns as in the live
+    database, so analyze.py can read archives like live databases."""
+
+    __bind_key__ = "archive"
+    __tablename__ = "orders"
+
+    products = db.relationship("ArchivedProduct", back_populates="order")
+
+    @staticmethod
+    def get_orders_for_bar(bar: str) -> list[ArchivedOrder]:
+        catalog_ids = app.config["minipos"].bar_products[bar]
+        return list(
+            db.session.execute(
+                db.select(ArchivedOrder)
+                .join(ArchivedOrder.products)
+                .filter(ArchivedProduct.catalog_id.in_(catalog_ids))
+                .group_by(ArchivedOrder)
+                .order_by(ArchivedOrder.completed_at.desc())
+            ).scalars()
+        )
+
+    @staticmethod
+    def get_orders_by_table(table: str) -> list[ArchivedOrder]:
+        query = db.select(ArchivedOrder).filter_by(table=table).order_by(ArchivedOrder.id.desc())
+        return list(db.session.execute(query).scalars())
+
+
+class ArchivedProduct(ProductMixin, db.Model):
+    __bind_key__ = "archive"
+    __tablename__ = "products"
+
+    order_id = db.Column(db.Integer, db.ForeignKey(ArchivedOrder.id))
+    catalog_id = db.Column(db.Integer, db.ForeignKey(ArchivedCatalogItem.id))
+
+    order = db.relationship(ArchivedOrder, back_populates="products")
+    item = db.relationship(ArchivedCatalogItem, lazy="joined")
+
+
+def archive_orders(before: datetime, batch_size: int) -> int:
+    """Move orders completed before the given date with their products to the archive database.
+    Orders are moved in batches, each batch is written to the archive before it is deleted from the live database.
+    Rows already present in the archive (e.g. after a crash between both steps) are skipped.
+    Returns the number of archived orders."""
+    archived = 0
+
+    # The newest order is never archived. sqlite assigns max(id) + 1 to new rows, deleting the newest order and
+    # products would reuse ids of archived rows
+    newest = db.select(func.max(Order.id)).scalar_subquery()
+
+    while order_ids := list(
+        db.session.execute(
+            db.select(Order.id)
+            .filter(Order.completed_at.isnot(None), Order.completed_at < before, Order.id < newest)
+            .order_by(Order.id)
+            .limit(batch_size)
+        ).scalars()
+    ):
+        products = db.session.execute(db.select(Product.__table__).filter(Product.order_id.in_(order_ids))).all()
+        orders = db.session.execute(db.select(Order.__table__).filter(Order.id.in_(order_ids))).all()
+        catalog_ids = {p.catalog_id for p in products}
+        items = db.session.execute(db.select(CatalogItem.__table__).filter(CatalogItem.id.in_(catalog_ids))).all()
+
+        for model, rows in ((ArchivedCatalogItem, items), (ArchivedOrder, orders), (ArchivedProduct, products)):
+            if rows:
+                db.session.execute(insert(model).on_conflict_do_nothing(), [row._asdict() for row in rows])
+        db.session.commit()
+
+        db.session.execute(db.delete(Product).filter(Product.order_id.in_(order_ids)))
+        db.session.execute(db.delete(Order).filter(Order.id.in_(order_ids)))
+        Version.bump("archive")  # completed orders of the bar view may have been moved
+        db.session.commit()
+
+        archived += len(order_ids)
+        app.logger.info("Archived %s orders", archived)
+
+    return archived
+
+
+def upsert_counters(model, keys: list[str], counters: tuple[str, ...], rows: list[dict]) -> None:
+    """Add counter values to rows identified by keys, rows are created if missing.
+    All rows are written with a single upsert statement in the current transaction."""
+    if not rows:
+        return
+
+    rows = [{k: row[k] for k in keys} | {c: row.get(c, 0) for c in counters} for row in rows]
+
+    stmt = insert(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[getattr(model, k) for k in keys],
+        set_={c: getattr(model, c) + stmt.excluded[c] for c in counters},
+    )
+    db.session.execute(stmt, rows)
+
+
+def bars_for_product(catalog_id: int) -> list[str]:
+    return [bar for bar, catalog_ids in app.config["minipos"].bar_products.items() if catalog_id in catalog_ids]
+
+
+class Statistic(db.Model):
+    """Live statistics counters, one row per group (e.g. kind table, key A1).
+    Counters are updated in the transaction of the corresponding order change,
+    so reading statistics never has to aggregate orders or products."""
+
+    __tablename__ = "statistics"
+
+    KINDS = ("table", "waiter", "product", "bar")
+
+    kind = db.Column(db.String, primary_key=True)
+    key = db.Column(db.String, primary_key=True)
+    orders = db.Column(db.Integer, default=0)
+    items = db.Column(db.Integer, default=0)
+    revenue = db.Column(db.Integer, default=0)  # cents
+    completed = db.Column(db.Integer, default=0)  # completed orders (table, waiter) or products (product, bar)
+    completion_time = db.Column(db.Float, default=0)  # sum of completion times in seconds
+
+    COUNTERS = ("orders", "items", "revenue", "completed", "completion_time")
+
+    @property
+    def average_completion_time(self) -> int | None:
+        return round(self.completion_time / self.completed) if self.completed else None
+
+    def to_dict(self) -> dict:
+        return {c: getattr(self, c) for c in ("key", *self.COUNTERS)} | {
+            "average_completion_time": self.average_completion_time
+        }
+
+    @staticmethod
+    def increment(increments: dict[tuple[str, str], dict[str, float]]) -> None:
+        """Add values to the counters of multiple groups (created if missing)"""
+        rows = [{"kind": kind, "key": key} | values for (kind, key), values in increments.items()]
+        upsert_counters(Statistic, ["kind", "key"], Statistic.COUNTERS, rows)
+
+    @staticmethod
+    def product_groups(product: Product) -> list[tuple[str, str]]:
+        return [("product", product.name)] + [("bar", bar) for bar in bars_for_product(product.catalog_id)]
+
+    @staticmethod
+    def record_order_created(order: Order, products: list[Product]) -> None:
+        increments: dict[tuple[str, str], dict[str, float]] = {}
+
+        for product in products:
+            for group in [("table", order.table), ("waiter", order.waiter), *Statistic.product_groups(product)]:
+                values = increments.setdefault(group, {"orders": 1, "items": 0, "revenue": 0})
+                values["items"] += product.amount
+                values["revenue"] += product.amount * product.price
+
+        Statistic.increment(increments)
+
+    @staticmethod
+    def record_product_completed(product: Product) -> None:
+        seconds = (datetime.now() - product.order.date).total_seconds()
+        groups = Statistic.product_groups(product)
+
+        Statistic.increment({group: {"completed": 1, "completion_time": seconds} for group in groups})
+
+    @staticmethod
+    def record_order_completed(order: Order) -> None:
+        seconds = (order.completed_at - order.date).total_seconds()
+        groups = [("table", order.table), ("waiter", order.waiter)]
+
+        Statistic.increment({group: {"completed": 1, "completion_time": seconds} for group in groups})
+
+    @staticmethod
+    def get_statistics(kind: str) -> list[Statistic]:
+        return list(
+            db.session.execute(
+                db.select(Statistic).filter_by(kind=kind).order_by(Statistic.revenue.desc(), Statistic.key)
+            ).scalars()
+        )
+
+
+class Rollup(db.Model):
+    """Throughput per minute and bar. The bar ROLLUP_ALL contains the values of all bars combined.
+    Rows are updated in the transaction of the corresponding order change like statistics."""
+
+    __tablename__ = "rollups"
+
+    ROLLUP_ALL = ""
+
+    bucket = db.Column(db.DateTime, primary_key=True)  # start of the minute
+    bar = db.Column(db.String, primary_key=True)
+    orders = db.Column(db.Integer, default=0)
+    items = db.Column(db.Integer, default=0)
+    revenue = db.Column(db.Integer, default=0)  # cents
+    completions = db.Column(db.Integer, default=0)  # completed orders (all bars) or products (single bar)
+    completion_time = db.Column(db.Float, default=0)  # sum of completion times in seconds
+
+    COUNTERS = ("orders", "items", "revenue", "completions", "completion_time")
+
+    def to_list(self) -> list:
+        return [self.bucket.isoformat(), *(getattr(self, c) for c in self.COUNTERS)]
+
+    @staticmethod
+    def increment(bucket: datetime, increments: dict[str, dict[str, float]]) -> None:
+        rows = [{"bucket": bucket.replace(second=0, microsecond=0), "bar": bar} | v for bar, v in increments.items()]
+        upsert_counters(Rollup, ["bucket", "bar"], Rollup.COUNTERS, rows)
+
+    @staticmethod
+    def record_order_created(order: Order, products: list[Product]) -> None:
+        increments: dict[str, dict[str, float]] = {}
+
+        for product in products:
+            for bar in [Rollup.ROLLUP_ALL, *bars_for_product(product.catalog_id)]:
+                values = increments.setdefault(bar, {"orders": 1, "items": 0, "revenue": 0})
+                values["items"] += product.amount
+                values["revenue"] += product.amount * product.price
+
+        Rollup.increment(order.date, increments)
+
+    @staticmethod
+    def record_product_completed(product: Product) -> None:
+        now = datetime.now()
+        seconds = (now - product.order.date).total_seconds()
+        bars = bars_for_product(product.catalog_id)
+
+        Rollup.increment(now, {bar: {"completions": 1, "completion_time": seconds} for bar in bars})
+
+    @staticmethod
+    def record_order_completed(order: Order) -> None:
+        seconds = (order.completed_at - order.date).total_seconds()
+
+        Rollup.increment(order.completed_at, {Rollup.ROLLUP_ALL: {"completions": 1, "completion_time": seconds}})
+
+    @staticmethod
+    def get_rollups(bar: str, since: datetime | None = None) -> list[Rollup]:
+        query = db.select(Rollup).filter_by(bar=bar)
+        if since is not None:
+            query = query.filter(Rollup.bucket >= since)
+
+        return list(db.session.execute(query.order_by(Rollup.bucket)).scalars())
+
+
+class Version(db.Model):
+    """Change counters shared by all workers, used to invalidate per-worker caches"""
+
+    __tablename__ = "versions"
+
+    name = db.Column(db.String, primary_key=True)
+    version = db.Column(db.Integer, default=0)
+
+    @staticmethod
+    def bump(name: str) -> None:
+        upsert_counters(Version, ["name"], ("version",), [{"name": name, "version": 1}])
+
+    @staticmethod
+    def get(name: str) -> int:
+        return db.session.execute(db.select(Version.version).filter_by(name=name)).scalar_one_or_none() or 0
+
+
+class ConfigRevision(db.Model):
+    """Validated config files. The id of the latest revision is the config version all workers should use"""
+
+    __tablename__ = "config_revisions"
+    __table_args__ = {"sqlite_autoincrement": True}  # never reuse versions
+
+    id = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.Text)  # json
+    created_at = db.Column(db.DateTime)
+
+    @staticmethod
+    def add(data: str) -> int:
+        revision = ConfigRevision(data=data, created_at=datetime.now())
+        db.session.add(revision)
+        db.session.flush()
+        return revision.id
+
+    @staticmethod
+    def get_latest() -> ConfigRevision | None:
+        return db.session.execute(
+            db.select(ConfigRevision).order_by(ConfigRevision.id.desc()).limit(1)
+        ).scalar_one_or_none()
+
+    @staticmethod
+    def get_latest_version() -> int:
+        return db.session.execute(db.select(func.max(ConfigRevision.id))).scalar_one() or 0
+
+    @staticmethod
+    def get_revisions() -> list[ConfigRevision]:
+        return list(db.session.execute(db.select(ConfigRevision).order_by(ConfigRevision.id.desc())).scalars())
+
+
+class Stock(db.Model):
+    """Remaining quota of a product. Products without stock entry are unlimited"""
+
+    __tablename__ = "stock"
+
+    catalog_id = db.Column(db.Integer, db.ForeignKey(CatalogItem.id), primary_key=True)
+    remaining = db.Column(db.Integer)
+
+    @staticmethod
+    def take(catalog_id: int, amount: int) -> bool:
+        """Atomically decrement the quota of a product in the current transaction.
+        Returns False if the remaining quota is too small."""
+        remaining = db.session.execute(
+            update(Stock)
+            .filter(Stock.catalog_id == catalog_id, Stock.remaining >= amount)
+            .values(remaining=Stock.remaining - amount)
+            .returning(Stock.remaining)
+        ).scalar_one_or_none()
+
+        if remaining is None:
+            # Either no quota is defined (unlimited) or it is too small
+            return Stock.get_quota(catalog_id) is None
+
+        if remaining == 0:
+            app.logger.info("Product %s is sold out", catalog_id)
+            Version.bump("stock")
+
+        return True
+
+    @staticmethod
+    def get_quota(catalog_id: int) -> int | None:
+        return db.session.execute(db.select(Stock.remaining).filter_by(catalog_id=catalog_id)).scalar_one_or_none()
+
+    @staticmethod
+    def get_quotas() -> dict[int, int]:
+        query = db.select(Stock.catalog_id, Stock.remaining)
+        return dict(db.session.execute(query).all())
+
+    @staticmethod
+    def set_quota(catalog_id: int, remaining: int | None) -> None:
+        """Set the remaining quota of a product, None removes the quota"""
+        stock = db.session.get(Stock, catalog_id)
+
+        if remaining is None:
+            if stock is not None:
+                db.session.delete(stock)
+        elif stock is None:
+            db.session.add(Stock(catalog_id=catalog_id, remaining=remaining))
+        else:
+            stock.remaining = remaining
+
+        Version.bump("stock")
+
+    @staticmethod
+    def get_sold_out() -> set[int]:
+        """Catalog ids of sold out products. The set is cached per worker until the stock version changes"""
+        version = Version.get("stock")
+        cached = app.extensions.get("minipos_sold_out")
+
+        if cached is None or cached[0] != version:
+            sold_out = set(db.session.execute(db.select(Stock.catalog_id).filter(Stock.remaining <= 0)).scalars())
+            cached = app.extensions["minipos_sold_out"] = (version, sold_out)
+
+        return cached[1]
+
+
+class PrintJob(db.Model):
+    """Bon waiting to be printed. Jobs are created in the order transaction and printed by mini_pos.printing"""
+
+    __tablename__ = "print_jobs"
+    __table_args__ = (db.Index("ix_print_jobs_printer_status", "printer", "status"),)
+
+    PENDING = "pending"
+    PRINTING = "printing"
+    DONE = "done"
+    FAILED = "failed"
+
+    BON_WIDTH = 32  # characters per line of a 58mm thermal printer
+
+    id = db.Column(db.Integer, primary_key=True)
+    printer = db.Column(db.String)  # bar name
+    order_id = db.Column(db.Integer)
+    payload = db.Column(db.Text)
+    status = db.Column(db.String, default=PENDING)
+    attempts = db.Column(db.Integer, default=0)
+    error = db.Column(db.String)
+    created_at = db.Column(db.DateTime)
+    next_attempt_at = db.Column(db.DateTime)  # pending: earliest retry, printing: start of printing
+
+    @staticmethod
+    def format_bon(order: Order, products: list[Product], bar: str) -> str:
+        lines = [
+            f"Tisch {order.table}" + (f" ({order.waiter})" if order.waiter else ""),
+            f"{order.date.strftime('%Y-%m-%d %H:%M:%S')}  #{order.id}".rjust(PrintJob.BON_WIDTH),
+            bar,
+            "-" * PrintJob.BON_WIDTH,
+        ]
+        lines += [f"{p.amount}x {p.name}" + (f" ({p.comment})" if p.comment else "") for p in products]
+
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def record_order_created(order: Order, products: list[Product]) -> None:
+        for bar in app.config["minipos"].printers:
+            bar_products = [p for p in products if p.catalog_id in app.config["minipos"].bar_products.get(bar, ())]
+
+            if bar_products:
+                db.session.add(
+                    PrintJob(
+                        printer=bar,
+                        order_id=order.id,
+                        payload=PrintJob.format_bon(order, bar_products, bar),
+                        status=PrintJob.PENDING,
+                        attempts=0,
+                        created_at=order.date,
+                        next_attempt_at=order.date,
+                    )
+                )
+
+    @staticmethod
+    def claim(printer: str, stale_after: timedelta) -> PrintJob | None:
+        """Get the next job of a printer and mark it as printing. Jobs are claimed with a conditional update,
+        so each job is printed by only one worker. Jobs stuck in printing (e.g. crashed worker) are retried."""
+        now = datetime.now()
+        claimable = ((PrintJob.status == PrintJob.PENDING) & (PrintJob.next_attempt_at <= now)) | (
+            (PrintJob.status == PrintJob.PRINTING) & (PrintJob.next_attempt_at <= now - stale_after)
+        )
+
+        while (
+            job_id := db.session.execute(
+                db.select(PrintJob.id).filter(PrintJob.printer == printer, claimable).order_by(PrintJob.id).limit(1)
+            ).scalar_one_or_none()
+        ) is not None:
+            claimed = db.session.execute(
+                update(PrintJob)
+                .filter(PrintJob.id == job_id, claimable)
+                .values(status=PrintJob.PRINTING, next_attempt_at=now)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.commit()
+
+            if claimed:
+                return db.session.get(PrintJob, job_id)
+
+        return None
+
+    @staticmethod
+    def count_by_status(printer: str) -> dict[str, int]:
+        query = db.select(PrintJob.status, func.count()).filter_by(printer=printer).group_by(PrintJob.status)
+        return dict(db.session.execute(query).all())
+
+
+class Event(db.Model):
+    """Append-only audit log of order changes. Written in the same transaction as the change itself.
+    The sequence number is strictly increasing and can be used by clients to fetch changes since their last visit."""
+
+    __tablename__ = "events"
+    __table_args__ = {"sqlite_autoincrement": True}  # never reuse sequence numbers
+
+    ORDER_CREATED = "order_created"
+    PRODUCT_COMPLETED = "product_completed"
+    ORDER_COMPLETED = "order_completed"
+
+    seq = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String)
+    order_id = db.Column(db.Integer)
+    product_id = db.Column(db.Integer)
+    bar = db.Column(db.String)  # bar that completed the product/order, None if unknown
+    timestamp = db.Column(db.DateTime)
+    worker = db.Column(db.Integer)  # pid of the server process
+
+    def to_dict(self) -> dict:
+        return {
+            "seq": self.seq,
+            "kind": self.kind,
+            "order_id": self.order_id,
+            "product_id": self.product_id,
+            "bar": self.bar,
+            "timestamp": self.timestamp.isoformat(),
+            "worker": self.worker,
+        }
+
+    @staticmethod
+    def add(kind: str, order_id: int, product_id: int | None = None, bar: str | None = None) -> None:
+        db.session.add(
+            Event(
+                kind=kind,
+                order_id=order_id,
+                product_id=product_id,
+                bar=bar,
+                timestamp=datetime.now(),
+                worker=os.getpid(),
+            )
+        )
+
+    @staticmethod
+    def get_events_since(seq: int, limit: int) -> list[Event]:
+        return list(
+            db.session.execute(db.select(Event).filter(Event.seq > seq).order_by(Event.seq).limit(limit)).scalars()
+        )
+
+    @staticmethod
+    def latest_seq() -> int:
+        """Sequence number of the latest event. Changes whenever an order or product changes its state"""
+        return db.session.execute(db.select(func.max(Event.seq))).scalar_one() or 0
+
+
+def get_state_version() -> str:
+    """Changes whenever an order changes (event seq), orders are archived or a new config is loaded.
+    Views of orders can be cached until it changes."""
+    return f"{Event.latest_seq()}-{Version.get('archive')}-{app.extensions['minipos_config']['version']}"
+
+
+# Keep derived data (statistics, rollups, print jobs, events) in sync, called before committing the change
+def record_order_created(order: Order, products: list[Product]) -> None:
+    Statistic.record_order_created(order, products)
+    Rollup.record_order_created(order, products)
+    PrintJob.record_order_created(order, products)
+    Event.add(Event.ORDER_CREATED, order.id)
+
+
+def record_product_completed(product: Product, bar: str | None = None) -> None:
+    Statistic.record_product_completed(product)
+    Rollup.record_product_completed(product)
+    Event.add(Event.PRODUCT_COMPLETED, product.order_id, product.id, bar)
+
+
+def record_order_completed(order: Order, bar: str | None = None) -> None:
+    Statistic.record_order_completed(order)
+    Rollup.record_order_completed(order)
+    Event.add(Event.ORDER_COMPLETED, order.id, bar=bar)
+
+
+def set_pragmas(pragmas: dict, dbapi_connection, _connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
 
 def init_db(app):
     db.init_app(app)
 
+    # Connection settings are not stored in the database file (except the journal mode), apply them to every connection
+    for engine in db.engines.values():
+        event.listen(engine, "connect", partial(set_pragmas, app.config["SQLITE_PRAGMAS"]))
+
     if not os.path.isfile(f"instance/{app.config['DATABASE_FILE']}"):
         app.logger.info("No database file found. Creating database.")
-        db.create_all()
+
+    # Update databases of older versions
+    for engine in db.engines.values():
+        migrate(engine)
+
+    # Create missing tables, e.g. tables added in a newer version. Existing tables are not modified
+    db.create_all()
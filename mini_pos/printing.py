@@ -0,0 +1,140 @@
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+from .models import PrintJob, db
+
+MAX_ATTEMPTS = 10
+RETRY_DELAY = 2  # seconds, doubled on every failed attempt
+MAX_RETRY_DELAY = 60  # seconds
+STALE_AFTER = timedelta(minutes=2)  # jobs stuck in printing this long are printed again
+POLL_INTERVAL = 1  # seconds
+
+
+class FileBackend:
+    """Append bons to a file. Can be used as local stand-in for a printer or to print via a spooler"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def send(self, payload: str) -> None:
+        with open(self.path, "a", encoding="utf-8") as afile:
+            afile.write(payload + "\n")
+
+
+class SocketBackend:
+    """Send bons to a network printer accepting raw ESC/POS data (usually port 9100)"""
+
+    INIT = b"\x1b@"
+    CUT = b"\n\n\n\x1dV\x01"  # feed, partial cut
+
+    def __init__(self, host: str, port: int, timeout: float = 5.0) -> None:
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def send(self, payload: str) -> None:
+        data = self.INIT + payload.encode("cp437", errors="replace") + self.CUT
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
+            sock.sendall(data)
+
+
+def backend_for(target: str) -> FileBackend | SocketBackend:
+    url = urlsplit(target)
+
+    if url.scheme == "file":
+        return FileBackend(url.netloc + url.path)
+    if url.scheme == "tcp" and url.hostname:
+        return SocketBackend(url.hostname, url.port or 9100)
+
+    msg = f"Invalid printer {target}"
+    raise ValueError(msg)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY))
+
+
+def print_next(app, printer: str, backend) -> bool:
+    """Print the next job of a printer. Returns False if there is nothing to do"""
+    if (job := PrintJob.claim(printer, STALE_AFTER)) is None:
+        return False
+
+    try:
+        backend.send(job.payload)
+    except OSError as e:
+        job.attempts += 1
+        job.error = str(e)
+
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = PrintJob.FAILED
+            app.logger.exception("Printing order %s on %s failed. Giving up...", job.order_id, printer)
+        else:
+            job.status = PrintJob.PENDING
+            job.next_attempt_at = datetime.now() + retry_delay(job.attempts)
+            app.logger.warning("Printing order %s on %s failed: %s. Retrying...", job.order_id, printer, e)
+    else:
+        job.status = PrintJob.DONE
+        job.error = None
+        app.logger.info("Printed order %s on %s", job.order_id, printer)
+
+    db.session.commit()
+    return True
+
+
+def drain(app, printer: str) -> int:
+    """Print all jobs of a printer that are due. Returns the number of processed jobs"""
+    if (target := app.config["minipos"].printers.get(printer)) is None:
+        return 0  # removed by config reload
+
+    backend = backend_for(target)
+    count = 0
+
+    with app.app_context():
+        while print_next(app, printer, backend):
+            count += 1
+
+    return count
+
+
+class PrintWorker(threading.Thread):
+    """Background thread draining the print queue of one printer"""
+
+    def __init__(self, app, printer: str) -> None:
+        super().__init__(name=f"print-{printer}", daemon=True)
+        self.app = app
+        self.printer = printer
+
+    def run(self) -> None:
+        while True:
+            try:
+                drain(self.app, self.printer)
+            except Exception:
+                self.app.logger.exception("Print worker for %s crashed. Restarting...", self.printer)
+
+            time.sleep(POLL_INTERVAL)
+
+
+def start_print_workers(app) -> list[PrintWorker]:
+    """Start a worker for every configured printer that has none yet, e.g. printers added by a config reload.
+    Workers of removed printers keep running idle and continue if the printer is added again."""
+    if (workers := app.extensions.get("minipos_printing")) is None:
+        return []  # printing is not started in this process (tests, master process of mini_pos serve)
+
+    started = [PrintWorker(app, printer) for printer in app.config["minipos"].printers if printer not in workers]
+    for worker in started:
+        app.logger.info("Starting print worker for %s", worker.printer)
+        workers[worker.printer] = worker
+        worker.start()
+
+    return started
+
+
+def init_printing(app) -> list[PrintWorker]:
+    if app.config["TESTING"]:
+        return []
+
+    app.extensions["minipos_printing"] = {}
+    return start_print_workers(app)
@@ -1,11 +1,22 @@
+from .admin import admin_bp
 from .bar import bar_bp
 from .fetch import fetch_bp
 from .home import home_bp
 from .service import service_bp
+from .statistics import statistics_bp
+
+
+def money(cents: int) -> str:
+    """Format integer cents as euros, e.g. 350 -> 3.50"""
+    return f"{cents // 100}.{cents % 100:02d}"
 
 
 def register_blueprints(app):
+    app.add_template_filter(money)
+
     app.register_blueprint(home_bp)
     app.register_blueprint(bar_bp, url_prefix="/bar")
     app.register_blueprint(service_bp, url_prefix="/service")
     app.register_blueprint(fetch_bp, url_prefix="/fetch")
+    app.register_blueprint(statistics_bp, url_prefix="/statistics")
+    app.register_blueprint(admin_bp, url_prefix="/admin")
@@ -0,0 +1,125 @@
+import hmac
+from datetime import datetime
+
+from flask import Blueprint, Response, redirect, render_template, request, stream_with_context, url_for
+from flask import current_app as app
+
+from mini_pos.config import reload_config
+from mini_pos.export import EXPORT_FORMATS, EXPORT_KINDS, export, parquet_available
+from mini_pos.models import ConfigRevision, Stock, db
+
+admin_bp = Blueprint("admin", __name__, template_folder="templates")
+
+
+@admin_bp.before_request
+def admin_auth():
+    password = app.config["ADMIN_PASSWORD"]
+
+    if password is None:
+        app.logger.warning("Request in /admin but no admin password set. Skipping...")
+        return "Error! Admin disabled", 403
+
+    auth = request.authorization
+    if auth is None or not hmac.compare_digest((auth.password or "").encode(), password.encode()):
+        return "Error! Unauthorized", 401, {"WWW-Authenticate": 'Basic realm="MiniPOS Admin"'}
+
+    return None
+
+
+@admin_bp.route("/", strict_slashes=False)
+def admin():
+    return redirect(url_for("admin.admin_stock"))
+
+
+@admin_bp.route("/stock", strict_slashes=False)
+def admin_stock():
+    app.logger.debug("GET /admin/stock")
+
+    quotas = Stock.get_quotas()
+
+    return render_template(
+        "admin_stock.html",
+        products=[(p, pval[0], pval[2], quotas.get(p)) for p, pval in app.config["minipos"].products.items()],
+    )
+
+
+@admin_bp.route("/stock", methods=["POST"], strict_slashes=False)
+def admin_stock_submit():
+    app.logger.debug("POST /admin/stock")
+
+    for product, (name, _, _) in app.config["minipos"].products.items():
+        quota_param = request.form.get(f"quota-{product}")
+
+        if quota_param is None:
+            continue
+
+        if quota_param.strip() == "":
+            quota = None
+        elif quota_param.strip().isdigit():
+            quota = int(quota_param)
+        else:
+            app.logger.warning("POST in /admin/stock with quota not convertible to integer. Skipping...")
+            continue
+
+        if quota != Stock.get_quota(product):
+            Stock.set_quota(product, quota)
+            app.logger.info("Set quota of product %s to %s", name, "unlimited" if quota is None else quota)
+
+    db.session.commit()
+
+    return redirect(url_for("admin.admin_stock"))
+
+
+@admin_bp.route("/config", strict_slashes=False)
+def admin_config():
+    app.logger.debug("GET /admin/config")
+
+    return render_template(
+        "admin_config.html",
+        version=app.extensions["minipos_config"]["version"],
+        revisions=ConfigRevision.get_revisions(),
+    )
+
+
+@admin_bp.route("/config", methods=["POST"], strict_slashes=False)
+def admin_config_submit():
+    app.logger.debug("POST /admin/config")
+
+    if reload_config(app) is None:
+        app.logger.error("POST in /admin/config but config file is invalid. Skipping...")
+        return "Error! Invalid config file, see log for details"
+
+    return redirect(url_for("admin.admin_config"))
+
+
+@admin_bp.route("/export/<kind>", strict_slashes=False)
+def admin_export(kind: str):
+    app.logger.debug("GET /admin/export/%s", kind)
+
+    fmt = request.args.get("format", "csv")
+
+    if kind not in EXPORT_KINDS or fmt not in EXPORT_FORMATS:
+        app.logger.warning("GET in /admin/export with invalid kind or format. Skipping...")
+        return "Error! Invalid export", 400
+
+    if fmt == "parquet" and not parquet_available():
+        app.logger.error("GET in /admin/export with format parquet but pyarrow is not installed. Skipping...")
+        return "Error! Parquet export requires pyarrow", 400
+
+    try:
+        start, end = (
+            datetime.fromisoformat(value) if (value := request.args.get(param)) else None for param in ("from", "to")
+        )
+    except ValueError:
+        app.logger.warning("GET in /admin/export with date not in iso format. Skipping...")
+        return "Error! Invalid date", 400
+
+    filename = f"{kind}.{fmt}"
+    mimetype = "text/csv" if fmt == "csv" else "application/vnd.apache.parquet"
+
+    # The generator runs after the view returned, the context is kept for the database access
+    return Response(
+        stream_with_context(export(kind, fmt, start, end)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
@@ -1,7 +1,10 @@
+import time
+
 from flask import Blueprint, redirect, render_template, request, url_for
 from flask import current_app as app
 
 from mini_pos.models import Order, Product
+from mini_pos.writer import WriteError, write
 
 bar_bp = Blueprint("bar", __name__, template_folder="templates")
 
@@ -24,7 +27,9 @@ def bar_selection():
 def bar_name(bar: str):
     app.logger.debug("GET /bar/<bar>")
 
-    if app.config["minipos"].bars.get(bar) is None:
+    config = app.config["minipos"]
+
+    if config.bars.get(bar) is None:
         app.logger.error("GET in /bar/%s with invalid bar. Using default bar. Skipping...", bar)
         return "Error! Bar not found"
 
@@ -33,8 +38,11 @@ def bar_name(bar: str):
         orders=Order.get_open_orders_for_bar(bar),
         partially_completed_orders=Order.get_partially_completed_order_for_bar(bar),
         completed_orders=Order.get_last_completed_orders_for_bar(bar),
-        show_completed=bool(app.config["minipos"].ui.bar.show_completed),
+        show_completed=bool(config.ui.bar.show_completed),
+        timeout_warn=config.ui.bar.timeout_warn,
+        timeout_crit=config.ui.bar.timeout_crit,
         bar=bar,
+        server_time=time.time(),
     )
 
 @bar_bp.route("/<bar>/history", strict_slashes=False)
@@ -51,6 +59,17 @@ def bar_history(bar: str):
         bar=bar
     )
 
+@bar_bp.route("/<bar>/picklist", strict_slashes=False)
+def bar_picklist(bar: str):
+    app.logger.debug("GET /bar/<bar>/picklist")
+
+    if app.config["minipos"].bars.get(bar) is None:
+        app.logger.error("GET in /bar/%s/picklist with invalid bar. Skipping...", bar)
+        return "Error! Bar not found"
+
+    return render_template("bar_picklist.html", pick_list=Product.get_pick_list(bar), bar=bar)
+
+
 @bar_bp.route("/<bar>", methods=["POST"], strict_slashes=False)
 def bar_submit(bar: str):
     app.logger.debug("POST /bar/<bar>")
@@ -61,51 +80,24 @@ def bar_submit(bar: str):
     if order_id is not None and product_id is not None:
         app.logger.info("POST in /bar with order and product completion data. Using order...")
 
-    if order_id is not None:
-        if not order_id.isdigit():
-            app.logger.error("POST in /bar but filetype not convertible to integer")
-        else:
-            handle_order_completed_event(int(order_id), bar)
+    try:
+        if order_id is not None:
+            if not order_id.isdigit():
+                app.logger.error("POST in /bar but filetype not convertible to integer")
+            else:
+                write("complete_order", int(order_id), bar)
 
-    elif product_id is not None:
-        if not product_id.isdigit():
-            app.logger.error("POST in /bar but filetype not convertible to integer")
-        else:
-            handle_product_completed_event(int(product_id))
+        elif product_id is not None:
+            if not product_id.isdigit():
+                app.logger.error("POST in /bar but filetype not convertible to integer")
+            else:
+                write("complete_product", int(product_id), bar)
 
-    else:
-        app.logger.error("POST in /bar but neither order nor product specified")
+        else:
+            app.logger.error("POST in /bar but neither order nor product specified")
+    except WriteError as e:
+        app.logger.warning("POST in /bar/%s but completion was rejected: %s. Skipping...", bar, e)
+        # show the message, then return to the bar screen
+        return f"Error! {e}", {"Refresh": f"3; url={url_for('bar.bar_name', bar=bar)}"}
 
     return redirect(url_for("bar.bar_name", bar=bar))
-
-
-def handle_order_completed_event(order_id: int, bar: str) -> None:
-    order = Order.get_order_by_id(order_id)
-
-    if order is None:
-        app.logger.error("POST in /bar but no matching order to complete")
-        return
-
-    order.complete_for_bar(bar)
-
-
-def handle_product_completed_event(product_id: int) -> None:
-    product = Product.get_product_by_id(product_id)
-
-    if product is None:
-        app.logger.error("POST in /bar but no matching product found")
-        return
-
-    product.complete()
-    order_id = product.order_id
-
-    if app.config["minipos"].ui.bar.auto_close and len(Product.get_open_products_by_order_id(order_id)) == 0:
-        # Since orders are filtered for different bars, we only have to check the case that an order is really
-        # closed, not that it is partially closed by one bar only
-        app.logger.info("Last Product completed. Attempting auto_close")
-
-        if (order := Order.get_order_by_id(order_id)) is None:
-            app.logger.error("POST in /bar but no matching order for product found")
-            return
-
-        order.complete()
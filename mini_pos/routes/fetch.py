@@ -1,10 +1,35 @@
-from flask import Blueprint, jsonify, render_template
+from datetime import datetime
+
+from flask import Blueprint, jsonify, make_response, render_template, request
 from flask import current_app as app
 
-from mini_pos.models import Order
+from mini_pos.models import Event, Order, Product, Rollup, Statistic, get_state_version
 
 fetch_bp = Blueprint("fetch", __name__, template_folder="templates")
 
+EVENTS_LIMIT = 1000  # maximum number of events per request
+
+
+def render_bar_body(bar: str, version: str) -> str:
+    """Timers are computed by the client, the body only changes with the state version.
+    Screens of the same bar share the rendered body"""
+    ui_bar = app.config["minipos"].ui.bar
+
+    return app.extensions["minipos_response_cache"].get(
+        f"bar/{bar}",
+        version,
+        lambda: render_template(
+            "bar_body.html",
+            orders=Order.get_open_orders_for_bar(bar),
+            partially_completed_orders=Order.get_partially_completed_order_for_bar(bar),
+            completed_orders=Order.get_last_completed_orders_for_bar(bar),
+            show_completed=bool(ui_bar.show_completed),
+            timeout_warn=ui_bar.timeout_warn,
+            timeout_crit=ui_bar.timeout_crit,
+            bar=bar,
+        ),
+    )
+
 
 @fetch_bp.route("/bar/<bar>", strict_slashes=False)
 def fetch_bar(bar: str):
@@ -14,17 +39,79 @@ def fetch_bar(bar: str):
         app.logger.error("GET in /bar/%s with invalid bar. Using default bar. Skipping...", bar)
         return "Error! Bar not found"
 
-    return render_template(
-        "bar_body.html",
-        orders=Order.get_open_orders_for_bar(bar),
-        partially_completed_orders=Order.get_partially_completed_order_for_bar(bar),
-        completed_orders=Order.get_last_completed_orders_for_bar(bar),
-        show_completed=bool(app.config["minipos"].ui.bar.show_completed),
-        bar=bar,
-    )
+    version = get_state_version()
+
+    # The screen already shows this version, answer without rendering or looking up the body
+    if request.if_none_match.contains_weak(version):
+        response = make_response("", 304)
+    else:
+        response = make_response(render_bar_body(bar, version))
+
+    response.set_etag(version)
+    return response
+
+
+@fetch_bp.route("/picklist/<bar>", strict_slashes=False)
+def fetch_picklist(bar: str):
+    app.logger.debug("GET /fetch/picklist/<bar>")
+
+    if app.config["minipos"].bars.get(bar) is None:
+        app.logger.error("GET in /fetch/picklist/%s with invalid bar. Skipping...", bar)
+        return "Error! Bar not found"
+
+    return jsonify(Product.get_pick_list(bar))
 
 
 @fetch_bp.route("/service", strict_slashes=False)
 def fetch_service():
     app.logger.debug("GET /fetch/service")
     return jsonify(Order.get_active_tables())
+
+
+@fetch_bp.route("/statistics/<kind>", strict_slashes=False)
+def fetch_statistics(kind: str):
+    app.logger.debug("GET /fetch/statistics/<kind>")
+
+    if kind not in Statistic.KINDS:
+        app.logger.error("GET in /fetch/statistics/%s with invalid kind. Skipping...", kind)
+        return "Error! Statistic not found"
+
+    return jsonify([s.to_dict() for s in Statistic.get_statistics(kind)])
+
+
+@fetch_bp.route("/rollups", defaults={"bar": Rollup.ROLLUP_ALL}, strict_slashes=False)
+@fetch_bp.route("/rollups/<bar>", strict_slashes=False)
+def fetch_rollups(bar: str):
+    app.logger.debug("GET /fetch/rollups/<bar>")
+
+    if bar != Rollup.ROLLUP_ALL and app.config["minipos"].bars.get(bar) is None:
+        app.logger.error("GET in /fetch/rollups/%s with invalid bar. Skipping...", bar)
+        return "Error! Bar not found"
+
+    since = request.args.get("since")
+
+    try:
+        since_date = datetime.fromisoformat(since) if since is not None else None
+    except ValueError:
+        app.logger.exception("GET in /fetch/rollups/%s with invalid since parameter. Skipping...", bar)
+        return "Error! Invalid since parameter"
+
+    rollups = Rollup.get_rollups(bar, since_date)
+    return jsonify({"columns": ["bucket", *Rollup.COUNTERS], "rows": [r.to_list() for r in rollups]})
+
+
+@fetch_bp.route("/events", strict_slashes=False)
+def fetch_events():
+    app.logger.debug("GET /fetch/events")
+
+    since = request.args.get("since", "0")
+
+    if not since.isdigit():
+        app.logger.error("GET in /fetch/events with invalid since parameter. Skipping...")
+        return "Error! Invalid since parameter"
+
+    events = Event.get_events_since(int(since), EVENTS_LIMIT)
+    seq = events[-1].seq if events else int(since)
+
+    # Clients continue with the returned seq, more is set if there are further events to fetch
+    return jsonify({"seq": seq, "more": len(events) == EVENTS_LIMIT, "events": [e.to_dict() for e in events]})
@@ -3,7 +3,8 @@ from random import randint
 from flask import Blueprint, make_response, redirect, render_template, request, url_for
 from flask import current_app as app
 
-from mini_pos.models import Order, Product, db
+from mini_pos.models import Order, Product, Stock
+from mini_pos.writer import WriteError, write
 
 service_bp = Blueprint("service", __name__, template_folder="templates")
 
@@ -12,15 +13,17 @@ service_bp = Blueprint("service", __name__, template_folder="templates")
 def service():
     app.logger.debug("GET /service")
 
+    config = app.config["minipos"]
+
     # Don't display table overview if there is only one table
-    tables = app.config["minipos"].tables.names
+    tables = config.tables.names
     if len(tables) == 1:
         return redirect(url_for("service.service_table", table=tables[0]))
 
     return render_template(
         "service.html",
-        tables_size=app.config["minipos"].tables.size,
-        tables_grid=app.config["minipos"].tables.grid,
+        tables_size=config.tables.size,
+        tables_grid=config.tables.grid,
         active_tables=Order.get_active_tables(),
     )
 
@@ -56,7 +59,9 @@ def service_login_submit():
 def service_table(table):
     app.logger.debug("GET /service/<table>")
 
-    if table not in app.config["minipos"].tables.names:
+    config = app.config["minipos"]
+
+    if table not in config.tables.names:
         app.logger.error("GET in /service/<table> but invalid table. Skipping...")
         return "Error! Invalid table"
 
@@ -70,9 +75,10 @@ def service_table(table):
             [f"{p.amount}x {p.name}" + (f" ({p.comment})" if p.comment else "") for p in ps]
             for ps in Product.get_open_product_lists_by_table(table)
         ],
-        products=[(p, pval[0], pval[1], pval[2]) for p, pval in app.config["minipos"].products.items()],
-        ui_config=app.config["minipos"].ui.service,
-        split_categories_init=app.config["minipos"].products[1][2] if len(app.config["minipos"].products) > 0 else 0,
+        products=[(p, pval[0], pval[1], pval[2]) for p, pval in config.products.items()],
+        sold_out=Stock.get_sold_out(),
+        ui_config=config.ui.service,
+        split_categories_init=config.product_list[0][2] if config.product_list else 0,
         nonce=nonce,
     )
 
@@ -85,7 +91,11 @@ def service_table_history(table):
 @service_bp.route("/<table>", methods=["POST"], strict_slashes=False)
 def service_table_submit(table):
     app.logger.debug("POST /service/<table>")
-    if table not in app.config["minipos"].tables.names:
+
+    # The config may be swapped by a reload in another thread, the whole order uses the same one
+    config = app.config["minipos"]
+
+    if table not in config.tables.names:
         app.logger.error("POST in /service/<table> but invalid table. Skipping...")
         return "Error! Invalid table"
 
@@ -99,17 +109,17 @@ def service_table_submit(table):
         app.logger.error("POST in /service/<table> but nonce not convertible to integer. Skipping...")
         return "Error! Nonce is not int"
 
-    if int(nonce) in Order.get_open_order_nonces():
-        app.logger.warning("Catched duplicate order by nonce %s", nonce)
-        return redirect(url_for("service.service"))
+    # Product ids are only valid for the config the form was rendered with
+    config_version = request.form.get("config-version")
+
+    if config_version is not None and config_version != str(app.extensions["minipos_config"]["version"]):
+        app.logger.warning("POST in /service/<table> with outdated config version. Skipping...")
+        return "Error! Config changed, please reload the page"
 
     waiter = request.cookies.get("waiter", "")
-    new_order = Order.create(waiter, table, nonce)
-    db.session.add(new_order)
-    db.session.flush()  # enforce creation of id, required to assign order_id to product
-    product_added = False
+    items = []
 
-    for product in range(1, len(app.config["minipos"].products) + 1):
+    for product in config.products:
         amount_param = request.form.get(f"amount-{product}")
 
         if amount_param is None:
@@ -135,25 +145,24 @@ def service_table_submit(table):
             comment = ""
 
         if amount > 0:
-            name, price, category = app.config["minipos"].products[product]
-            new_product = Product.create(new_order.id, name, price, category, amount, comment)
-            db.session.add(new_product)
-            db.session.flush()  # enforce creation of id, required for log
-            product_added = True
-            app.logger.info("Queued product %s for order %s", new_product.id, new_order.id)
-
-    if not product_added:
+            items.append((product, config.products[product][1], amount, comment))
+
+    if not items:
         app.logger.warning("POST in /service/<table> but order does not contain any product. Skipping...")
-    else:
-        db.session.commit()
-        app.logger.info("Added order %s", new_order.id)
-
-        if app.config["minipos"].ui.service.order_overview:
-            return render_template(
-                "service_table_overview.html",
-                table=table,
-                products=new_order.products,
-                ui_config=app.config["minipos"].ui.service,
-            )
+        return redirect(url_for("service.service"))
+
+    try:
+        order_id = write("create_order", waiter, table, int(nonce), items)
+    except WriteError as e:
+        app.logger.warning("POST in /service/<table> but order was rejected: %s. Skipping...", e)
+        return f"Error! {e}"
+
+    if order_id is not None and config.ui.service.order_overview:
+        return render_template(
+            "service_table_overview.html",
+            table=table,
+            products=Order.get_order_by_id(order_id).products,
+            ui_config=config.ui.service,
+        )
 
     return redirect(url_for("service.service"))
@@ -0,0 +1,26 @@
+from flask import Blueprint, render_template
+from flask import current_app as app
+
+from mini_pos.models import Statistic
+
+statistics_bp = Blueprint("statistics", __name__, template_folder="templates")
+
+# Kind of statistic and column header in the ui
+STATISTICS_NAMES = {"table": "Tisch", "waiter": "Bedienung", "product": "Produkt", "bar": "Bar"}
+
+
+@statistics_bp.route("/", strict_slashes=False)
+def statistics():
+    app.logger.debug("GET /statistics")
+    return render_template("statistics.html", kind="table", names=STATISTICS_NAMES)
+
+
+@statistics_bp.route("/by-<kind>", strict_slashes=False)
+def statistics_by(kind: str):
+    app.logger.debug("GET /statistics/by-<kind>")
+
+    if kind not in Statistic.KINDS:
+        app.logger.error("GET in /statistics/by-%s with invalid kind. Skipping...", kind)
+        return "Error! Statistic not found"
+
+    return render_template("statistics.html", kind=kind, names=STATISTICS_NAMES)
@@ -0,0 +1,137 @@
+"""Production server (mini_pos serve).
+
+Runs gunicorn with the app preloaded in the master process, so the config is read and the database is checked once.
+Templates are compiled and the bar views rendered before forking, workers inherit them. Background threads do not
+survive a fork, they are started in every worker after forking together with fresh database connections.
+
+SIGHUP reloads the config file and replaces the workers gracefully. For code updates, SIGUSR2 starts a new master
+with the new code next to the old one, which is then stopped with SIGTERM.
+"""
+
+import argparse
+import os
+
+from gunicorn.app.base import BaseApplication
+
+from . import create_app, start_background
+from .config import reload_config
+from .log import restart_logging
+from .models import Product, db, get_state_version
+from .routes.fetch import render_bar_body
+
+
+def cpu_count() -> int:
+    """Usable cores, respects cpu affinity e.g. of containers"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def default_workers() -> int:
+    return cpu_count() * 2 + 1
+
+
+def default_threads() -> int:
+    # requests mostly wait for sqlite and the network
+    return max(2, cpu_count())
+
+
+def close_connections(app) -> None:
+    """Connections must not be shared between processes"""
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def warm_up(app) -> None:
+    """Compile all templates and fill the caches before accepting traffic"""
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
+    with app.test_request_context():
+        version = get_state_version()
+        for bar in app.config["minipos"].bars:
+            render_bar_body(bar, version)
+            Product.get_pick_list(bar)
+
+    close_connections(app)
+
+
+def post_fork(app, server, worker) -> None:  # noqa: ARG001
+    restart_logging(app)
+
+    # Drop connections inherited from the master without closing them, the master may still use them
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    app.extensions["minipos_response_cache"].reset_connections()
+
+    start_background(app)
+
+
+class Server(BaseApplication):
+    def __init__(self, app, options: dict) -> None:
+        self.application = app
+        self.options = options
+        super().__init__()
+
+    def load_config(self) -> None:
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+        self.cfg.set("post_fork", lambda server, worker: post_fork(self.application, server, worker))
+
+    def load(self):
+        return self.application
+
+    def reload(self) -> None:
+        """Called by the master on SIGHUP before replacing the workers"""
+        super().reload()
+
+        with self.application.app_context():
+            reload_config(self.application)
+        close_connections(self.application)
+
+
+def server_options(args) -> dict:
+    options = {
+        "bind": args.bind,
+        "workers": args.workers,
+        "threads": args.threads,
+        "worker_class": "gthread",
+        "preload_app": True,
+        "keepalive": 5,  # bar screens and service poll every few seconds
+        "graceful_timeout": 30,
+    }
+
+    if os.path.isdir("/dev/shm"):  # noqa: S108
+        # heartbeat files of the workers, avoids blocking on slow (e.g. sd card or overlay) file systems
+        options["worker_tmp_dir"] = "/dev/shm"  # noqa: S108
+
+    return options
+
+
+def serve(args) -> None:
+    app = create_app(background=False)
+    warm_up(app)
+
+    app.logger.info("Starting %s workers with %s threads on %s", args.workers, args.threads, args.bind)
+    Server(app, server_options(args)).run()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="mini_pos", description="Small browser based POS system")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="run the production server")
+    serve_parser.add_argument("-b", "--bind", default="0.0.0.0:80", help="address to listen on")
+    serve_parser.add_argument("-w", "--workers", type=int, default=default_workers(), help="default 2 * cores + 1")
+    serve_parser.add_argument("-t", "--threads", type=int, default=default_threads(), help="threads per worker")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args)
+
+
+if __name__ == "__main__":
+    main()
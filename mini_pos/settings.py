@@ -1,9 +1,28 @@
+import os
+
+
 class Config:
     TESTING = False
     DEBUG = False
     CONFIG_FILE = "config.json"
     DATABASE_FILE = "data.db"
     SQLALCHEMY_DATABASE_URI = f"sqlite:///{DATABASE_FILE}"
+    ARCHIVE_DATABASE_FILE = "data-archive.db"
+    SQLALCHEMY_BINDS = {"archive": f"sqlite:///{ARCHIVE_DATABASE_FILE}"}
+    ARCHIVE_AFTER = os.environ.get("MINIPOS_ARCHIVE_AFTER")  # archive orders completed n minutes ago, disabled if None
+    BACKUP_DIR = "backups"  # relative to the instance folder or absolute
+    BACKUP_INTERVAL = os.environ.get("MINIPOS_BACKUP_INTERVAL")  # backup every n minutes, disabled if None
+    BACKUP_KEEP = 10  # number of backups to keep per database
+    WRITE_MODE = os.environ.get("MINIPOS_WRITE_MODE", "direct")  # "direct" or "queue" (single writer process)
+    WRITER_SOCKET = None  # unix socket of the writer, default instance/writer.sock
+    RESPONSE_CACHE_FILE = os.environ.get("MINIPOS_RESPONSE_CACHE")  # share rendered bar views between workers
+    TRAFFIC_LOG_FILE = os.environ.get("MINIPOS_TRAFFIC_LOG")  # record requests for replay.py, disabled if None
+    ADMIN_PASSWORD = os.environ.get("MINIPOS_ADMIN_PASSWORD")  # password for /admin, disabled if None
+    LOG_FILE = os.environ.get("MINIPOS_LOG_FILE")  # additional json log file, disabled if None
+    LOG_SAMPLING: dict[str, int] = {}  # only log every nth debug message per logger, e.g. {"mini_pos": 10}
+    TEMPLATE_CACHE_DIR = "template-cache"  # compiled templates, relative to the instance folder, disabled if None
+    # applied to every database connection, readers do not block the writer with WAL
+    SQLITE_PRAGMAS = {"journal_mode": "WAL", "synchronous": "NORMAL", "busy_timeout": 5000}
 
 
 class TestConfig:
@@ -12,3 +31,18 @@ class TestConfig:
     CONFIG_FILE = "config.json"
     DATABASE_FILE = "nonexistent.db"
     SQLALCHEMY_DATABASE_URI = "sqlite://"
+    ARCHIVE_DATABASE_FILE = "nonexistent-archive.db"
+    SQLALCHEMY_BINDS = {"archive": "sqlite://"}
+    ARCHIVE_AFTER = None
+    BACKUP_DIR = "backups"
+    BACKUP_INTERVAL = None
+    BACKUP_KEEP = 2
+    WRITE_MODE = "direct"
+    WRITER_SOCKET = None
+    RESPONSE_CACHE_FILE = None
+    TRAFFIC_LOG_FILE = None
+    ADMIN_PASSWORD = "admin"
+    LOG_FILE = None
+    LOG_SAMPLING: dict[str, int] = {}
+    TEMPLATE_CACHE_DIR = None
+    SQLITE_PRAGMAS = {"journal_mode": "WAL", "synchronous": "NORMAL", "busy_timeout": 5000}
@@ -1,21 +1,107 @@
-function startBarUpdate(name) {
+// Difference between server and client clock in ms, order timestamps are given in server time
+let clockOffset = 0;
+let lastBody = null;
+
+function startBarUpdate(name, serverTime) {
+    clockOffset = serverTime * 1000 - Date.now();
+    updateTimers();
+
+    let myTimerTimers = setInterval(updateTimers, 1000);
+
+    if (typeof EventSource === "undefined") {
+        startBarPolling(name);
+        return;
+    }
+
+    // Pushed updates when served via asgi, polling otherwise
+    let received = false;
+    const source = new EventSource("/push/bar/" + encodeURIComponent(name));
+
+    source.addEventListener("config", (event) => checkConfigVersionValue(event.data));
+    source.addEventListener("bar", (event) => {
+        received = true;
+        setBody(event.data);
+        setServerStatus(true);
+    });
+    source.onerror = () => {
+        if (!received || source.readyState === EventSource.CLOSED) {
+            source.close();
+            startBarPolling(name);
+        } else {
+            // The browser reconnects on its own
+            setServerStatus(false);
+        }
+    };
+}
+
+function startBarPolling(name) {
     let myTimer = setInterval(() => updateBarBody(name), 3000);
 }
 
-async function updateBarBody(name) {
+function setBody(body) {
+    if (body !== lastBody) {
+        lastBody = body;
+        document.getElementsByTagName('body')[0].innerHTML = body;
+        updateTimers();
+    }
+}
+
+function setServerStatus(up) {
     let server_status_div = document.getElementById("server-status");
+    if (server_status_div === null) {
+        return;
+    }
 
+    server_status_div.classList.remove(up ? "server-status-down" : "server-status-up");
+    server_status_div.classList.add(up ? "server-status-up" : "server-status-down");
+    server_status_div.innerHTML = up ? "Server is up" : "Server is down";
+}
+
+function formatTimer(seconds) {
+    if (seconds > 60 * 60) {
+        return ">60min";
+    }
+    return String(Math.floor(seconds / 60)).padStart(2, "0") + ":" + String(seconds % 60).padStart(2, "0");
+}
+
+function updateTimers() {
+    let table = document.getElementsByClassName("outer-table")[0];
+    if (table === undefined) {
+        return;
+    }
+
+    const now = (Date.now() + clockOffset) / 1000;
+    const timeoutWarn = Number(table.dataset.timeoutWarn);
+    const timeoutCrit = Number(table.dataset.timeoutCrit);
+
+    for (let timer of document.getElementsByClassName("order-timer")) {
+        const seconds = Math.max(0, Math.floor(now - Number(timer.dataset.created)));
+
+        timer.classList.remove("timeout_ok", "timeout_warn", "timeout_crit");
+        timer.classList.add(seconds > timeoutCrit ? "timeout_crit" : seconds > timeoutWarn ? "timeout_warn" : "timeout_ok");
+        timer.textContent = formatTimer(seconds);
+    }
+}
+
+async function updateBarBody(name) {
     try {
-        const response = await fetch("/fetch/bar/" + name);
-        document.getElementsByTagName('body')[0].innerHTML = await response.text();
+        // The browser revalidates with the etag, the body is only replaced if it changed
+        const response = await fetch("/fetch/bar/" + name, {cache: "no-cache"});
+        checkConfigVersion(response);
+
+        // The date header only has a resolution of seconds, ignore small differences to avoid jumping timers
+        const serverDate = response.headers.get("Date");
+        if (serverDate !== null) {
+            const offset = Date.parse(serverDate) - Date.now();
+            if (Math.abs(offset - clockOffset) > 2000) {
+                clockOffset = offset;
+            }
+        }
 
-        server_status_div.classList.remove("server-status-down");
-        server_status_div.classList.add("server-status-up");
-        server_status_div.innerHTML = "Server is up";
+        setBody(await response.text());
+        setServerStatus(true);
 
     } catch (error) {
-        server_status_div.classList.remove("server-status-up");
-        server_status_div.classList.add("server-status-down");
-        server_status_div.innerHTML = "Server is down";
+        setServerStatus(false);
     }
 }
@@ -0,0 +1,12 @@
+// Reload the page if the server config changed since the page was rendered (e.g. new products or tables)
+function checkConfigVersionValue(version) {
+    const meta = document.querySelector('meta[name="config-version"]');
+
+    if (version !== null && meta !== null && version !== meta.content) {
+        location.reload();
+    }
+}
+
+function checkConfigVersion(response) {
+    checkConfigVersionValue(response.headers.get("X-Config-Version"));
+}
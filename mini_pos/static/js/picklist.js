@@ -0,0 +1,46 @@
+function startPickListUpdate(name) {
+    let myTimer = setInterval(() => updatePickList(name), 3000);
+}
+
+async function updatePickList(name) {
+    let server_status_div = document.getElementById("server-status");
+
+    try {
+        const response = await fetch("/fetch/picklist/" + name);
+        checkConfigVersion(response);
+        const pickList = await response.json();
+
+        let body = document.getElementById("picklist-body");
+        body.innerHTML = "";  //clear rows
+
+        for(let i=0; i<pickList.length; i++) {
+            let item = pickList[i];
+            let row = document.createElement("tr");
+
+            for(const value of [item.amount + "x", item.name]) {
+                let cell = document.createElement("td");
+                cell.appendChild(document.createTextNode(value));
+                row.appendChild(cell);
+            }
+
+            let comments = document.createElement("td");
+            for(const [comment, amount] of Object.entries(item.comments)) {
+                if (comments.childNodes.length > 0) {
+                    comments.appendChild(document.createElement("br"));
+                }
+                comments.appendChild(document.createTextNode(amount + "x " + comment));
+            }
+            row.appendChild(comments);
+            body.appendChild(row);
+        }
+
+        server_status_div.classList.remove("server-status-down");
+        server_status_div.classList.add("server-status-up");
+        server_status_div.innerHTML = "Server is up";
+
+    } catch (error) {
+        server_status_div.classList.remove("server-status-up");
+        server_status_div.classList.add("server-status-down");
+        server_status_div.innerHTML = "Server is down";
+    }
+}
@@ -3,6 +3,7 @@ let myTimer = setInterval(updateActiveTables, 3000);
 async function updateActiveTables() {
     //Request new tables
     const response = await fetch("/fetch/service");
+    checkConfigVersion(response);
     const tables_new_ids = await response.json();
 
     //Get table elements
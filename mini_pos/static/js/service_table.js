@@ -45,6 +45,11 @@ function computeModifyAmountValue(current_value, value_change, max_value) {
     return current_value + value_change;
 }
 
+function formatMoney(cents) {
+    //Prices are integer cents, only convert for display
+    return (cents / 100).toFixed(2);
+}
+
 function fixNumFormat(textbox) {
     //Catch NaN's
     if (isNaN(textbox.value)) {
@@ -83,14 +88,14 @@ function updateValues() {
         let amount = Number(amounts[i].value);
         let comment = comments[i].value;
         let name = names[i].innerHTML;
-        let price = parseFloat(prices[i].innerHTML);
+        let price = Number(prices[i].dataset.price);
 
-        //Compute per product cose and accumulation
+        //Compute per product cost and accumulation in cents
         let current_cost = price * amount;
         sum += current_cost;
 
         //Set cost field
-        costs[i].innerHTML = current_cost.toFixed(2).toString();
+        costs[i].innerHTML = formatMoney(current_cost);
 
         //Sync second amount field
         amounts2[i].innerHTML = amount;
@@ -105,7 +110,7 @@ function updateValues() {
 
             let entry_text = amount + "x " + name
             entry_text += (comment !== "" ? " (" + comment + ")" : "");
-            let entry_text2 = current_cost.toFixed(2).toString() + "€";
+            let entry_text2 = formatMoney(current_cost) + "€";
 
             entry.appendChild(document.createTextNode(entry_text));
             entry2.appendChild(document.createTextNode(entry_text2));
@@ -120,7 +125,7 @@ function updateValues() {
 
     //Recompute total value
     let total = document.getElementById("total-cost");
-    total.innerHTML = sum.toFixed(2).toString();
+    total.innerHTML = formatMoney(sum);
 }
 
 function showPopup(pid) {
@@ -226,7 +231,7 @@ function updateValues2() {
         //Extract values
         let amount = Number(amounts[i].value);
         let name = names[i].innerHTML;
-        let price = parseFloat(prices[i].innerHTML);
+        let price = Number(prices[i].dataset.price);
 
         //Compute accumulation
         let current_cost = price * amount;
@@ -241,7 +246,7 @@ function updateValues2() {
             let entry2 = document.createElement('li');
 
             let entry_text = amount + "x " + name;
-            let entry_text2 = current_cost.toFixed(2).toString() + "€";
+            let entry_text2 = formatMoney(current_cost) + "€";
 
             entry.appendChild(document.createTextNode(entry_text));
             entry2.appendChild(document.createTextNode(entry_text2));
@@ -255,7 +260,7 @@ function updateValues2() {
 
     //Recompute total value
     let total = document.getElementById("total-cost");
-    total.innerHTML = sum.toFixed(2).toString();
+    total.innerHTML = formatMoney(sum);
 }
 
 function modifyAmount2(pid, value) {
@@ -294,7 +299,7 @@ function payPartially() {
 
     //Clear overview and total value
     document.getElementById("overview").innerHTML = "";
-    document.getElementById("total-cost").innerHTML = Number(0).toFixed(2).toString();
+    document.getElementById("total-cost").innerHTML = formatMoney(0);
 
     //Check if last product is completed
     if (document.getElementsByClassName("product-row").length == 0) {
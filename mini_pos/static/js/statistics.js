@@ -0,0 +1,32 @@
+function startStatisticsUpdate(kind) {
+    updateStatistics(kind);
+    let myTimer = setInterval(() => updateStatistics(kind), 3000);
+}
+
+function formatDuration(seconds) {
+    if (seconds === null) {
+        return "-";
+    }
+    return String(Math.floor(seconds / 60)).padStart(2, "0") + ":" + String(seconds % 60).padStart(2, "0");
+}
+
+async function updateStatistics(kind) {
+    const response = await fetch("/fetch/statistics/" + kind);
+    const statistics = await response.json();
+
+    let body = document.getElementById("statistics-body");
+    body.innerHTML = "";  //clear rows
+
+    for(let i=0; i<statistics.length; i++) {
+        let s = statistics[i];
+        let values = [s.key, s.orders, s.items, (s.revenue / 100).toFixed(2) + " €", s.completed, formatDuration(s.average_completion_time)];
+
+        let row = document.createElement("tr");
+        for(let j=0; j<values.length; j++) {
+            let cell = document.createElement("td");
+            cell.appendChild(document.createTextNode(values[j]));
+            row.appendChild(cell);
+        }
+        body.appendChild(row);
+    }
+}
@@ -0,0 +1,252 @@
+"""Database writes of order submission and completion.
+
+Writes run either directly in the request (WRITE_MODE direct) or are sent to a single writer (WRITE_MODE queue).
+The writer runs as thread in the one worker process holding the writer lock and receives the operations of all workers
+via a unix socket. Operations that arrive while a transaction is committed are committed together in the next one,
+each in its own savepoint, so a failing operation does not affect the others of its group.
+"""
+
+import os
+import queue
+import threading
+from multiprocessing.connection import Client, Listener
+
+from flask import current_app as app
+from sqlalchemy import text
+
+from .background import try_lock
+from .config import load_latest_config
+from .models import CatalogItem, Order, Product, Stock, db, record_order_created
+
+GROUP_COMMIT_SIZE = 100  # maximum operations per transaction
+WRITE_TIMEOUT = 10  # seconds to wait for the writer
+
+
+class WriteError(Exception):
+    """The operation was rejected, the message is shown to the user"""
+
+
+def create_order(waiter: str, table: str, nonce: int, items: list[tuple[int, int, int, str]]) -> int | None:
+    """Create an order with items (catalog_id, price, amount, comment). Returns the order id or None for duplicates"""
+    if nonce in Order.get_open_order_nonces():
+        app.logger.warning("Catched duplicate order by nonce %s", nonce)
+        return None
+
+    new_order = Order.create(waiter, table, nonce)
+    db.session.add(new_order)
+    db.session.flush()  # enforce creation of id, required to assign order_id to product
+    new_products = []
+
+    for catalog_id, price, amount, comment in items:
+        if not Stock.take(catalog_id, amount):
+            msg = f"{db.session.get(CatalogItem, catalog_id).name} is sold out"
+            raise WriteError(msg)
+
+        new_product = Product.create(new_order.id, catalog_id, price, amount, comment)
+        db.session.add(new_product)
+        db.session.flush()  # enforce creation of id, required for log
+        new_products.append(new_product)
+        app.logger.info("Queued product %s for order %s", new_product.id, new_order.id)
+
+    record_order_created(new_order, new_products)
+    app.logger.info("Added order %s", new_order.id)
+
+    return new_order.id
+
+
+def complete_order(order_id: int, bar: str) -> None:
+    order = Order.get_order_by_id(order_id)
+
+    if order is None:
+        app.logger.error("POST in /bar but no matching order to complete")
+        return
+
+    order.complete_for_bar(bar)
+
+
+def complete_product(product_id: int, bar: str) -> None:
+    product = Product.get_product_by_id(product_id)
+
+    if product is None:
+        app.logger.error("POST in /bar but no matching product found")
+        return
+
+    product.complete(bar)
+    order_id = product.order_id
+
+    if app.config["minipos"].ui.bar.auto_close and len(Product.get_open_products_by_order_id(order_id)) == 0:
+        # Since orders are filtered for different bars, we only have to check the case that an order is really
+        # closed, not that it is partially closed by one bar only
+        app.logger.info("Last Product completed. Attempting auto_close")
+
+        if (order := Order.get_order_by_id(order_id)) is None:
+            app.logger.error("POST in /bar but no matching order for product found")
+        else:
+            order.complete(bar)
+
+
+OPERATIONS = {f.__name__: f for f in (create_order, complete_order, complete_product)}
+
+
+class Writer(threading.Thread):
+    """Execute the operations of all workers one group per transaction"""
+
+    def __init__(self, app, address: str) -> None:
+        super().__init__(name="writer", daemon=True)
+        self.app = app
+        self.operations: queue.SimpleQueue = queue.SimpleQueue()
+
+        if os.path.exists(address):
+            os.remove(address)  # left over from a previous writer, the lock guarantees it is gone
+        self.listener = Listener(address, family="AF_UNIX")
+
+    def accept(self) -> None:
+        while True:
+            connection = self.listener.accept()
+            threading.Thread(target=self.receive, args=(connection,), daemon=True).start()
+
+    def receive(self, connection) -> None:
+        """Queue the operations of one client connection. Clients wait for the result, there is at most one
+        operation of a connection in the queue."""
+        with connection:
+            try:
+                while True:
+                    name, args = connection.recv()
+                    self.operations.put((connection, name, args))
+            except (EOFError, OSError):
+                pass
+
+    def execute(self, name: str, args: tuple) -> tuple[str, object]:
+        try:
+            with db.session.begin_nested():
+                return "ok", OPERATIONS[name](*args)
+        except WriteError as e:
+            return "rejected", str(e)
+        except Exception:
+            app.logger.exception("Write operation %s failed", name)
+            return "failed", f"{name} failed"
+
+    def commit(self, group: list) -> None:
+        with self.app.app_context():
+            try:
+                load_latest_config()
+
+                # Explicit transaction, otherwise releasing the first savepoint would already commit
+                db.session.execute(text("BEGIN IMMEDIATE"))
+                results = [self.execute(name, args) for _, name, args in group]
+                db.session.commit()
+            except Exception:
+                app.logger.exception("Commit of %s write operations failed", len(group))
+                db.session.rollback()
+                results = [("failed", "commit failed")] * len(group)
+
+        for (connection, _, _), result in zip(group, results, strict=True):
+            try:
+                connection.send(result)
+            except OSError:
+                self.app.logger.warning("Client of write operation disconnected. Skipping...")
+
+    def run(self) -> None:
+        threading.Thread(target=self.accept, name="writer-accept", daemon=True).start()
+
+        while True:
+            # Take everything that arrived during the last commit, never wait for more
+            group = [self.operations.get()]
+            while len(group) < GROUP_COMMIT_SIZE:
+                try:
+                    group.append(self.operations.get_nowait())
+                except queue.Empty:
+                    break
+
+            self.commit(group)
+
+
+def start_writer(app) -> bool:
+    """Start the writer in this process if no other process runs it. Returns True if the writer runs here"""
+    state = app.extensions["minipos_writer"]
+
+    with state["lock"]:
+        if state["writer"] is not None:
+            return True
+
+        if (fd := try_lock(state["address"] + ".lock")) is None:
+            return False
+
+        state["lock_fd"] = fd  # the lock is held until the process exits
+        state["writer"] = Writer(app, state["address"])
+        state["writer"].start()
+
+    app.logger.info("Running writer in process %s", os.getpid())
+    return True
+
+
+def send(name: str, args: tuple) -> tuple[str, object]:
+    """Send an operation to the writer and wait for the result.
+    Raises ConnectionError if the writer is not reachable and TimeoutError if it does not respond."""
+    state = app.extensions["minipos_writer"]
+    local = state["local"]
+
+    if getattr(local, "connection", None) is None:
+        try:
+            local.connection = Client(state["address"], family="AF_UNIX")
+        except OSError:
+            # The writer process is gone, take over if possible
+            if not start_writer(app._get_current_object()):  # noqa: SLF001
+                raise
+            local.connection = Client(state["address"], family="AF_UNIX")
+
+    try:
+        local.connection.send((name, args))
+        if local.connection.poll(WRITE_TIMEOUT):
+            return local.connection.recv()
+    except (OSError, EOFError) as e:
+        local.connection.close()
+        local.connection = None
+        raise ConnectionError(str(e)) from e
+
+    # A late response would be taken as result of the next operation
+    local.connection.close()
+    local.connection = None
+    msg = f"No response of writer within {WRITE_TIMEOUT}s"
+    raise TimeoutError(msg)
+
+
+def write(name: str, *args):
+    """Run a write operation and commit it. Raises WriteError if the operation was rejected"""
+    if app.config["WRITE_MODE"] == "queue":
+        try:
+            status, result = send(name, args)
+        except TimeoutError as e:
+            # The operation may still be committed, orders are protected against duplicates by their nonce
+            app.logger.exception("Write operation %s timed out", name)
+            msg = "Database busy, please try again"
+            raise WriteError(msg) from e
+        except OSError as e:
+            app.logger.warning("Writer not reachable: %s. Writing directly...", e)
+        else:
+            if status != "ok":
+                raise WriteError(result)
+            return result
+
+    try:
+        result = OPERATIONS[name](*args)
+    except WriteError:
+        db.session.rollback()
+        raise
+
+    db.session.commit()
+    return result
+
+
+def init_writer(app) -> None:
+    address = app.config["WRITER_SOCKET"] or os.path.join(app.instance_path, "writer.sock")
+    app.extensions["minipos_writer"] = {
+        "address": address,
+        "lock": threading.Lock(),
+        "local": threading.local(),
+        "writer": None,
+        "lock_fd": None,
+    }
+
+    if app.config["WRITE_MODE"] == "queue":
+        os.makedirs(os.path.dirname(address), exist_ok=True)
@@ -0,0 +1,156 @@
+#!/usr/bin/python3
+
+"""Replay a traffic log recorded with MINIPOS_TRAFFIC_LOG against a fresh instance and measure latencies."""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.http import dump_cookie
+
+from mini_pos import create_app
+from mini_pos.recorder import load_traffic
+from mini_pos.settings import Config
+
+
+def cookie_header(waiter: str) -> str:
+    """Build the cookie header a browser would send after service login"""
+    return dump_cookie("waiter", waiter).split(";", 1)[0]
+
+
+def request_target(entry: dict) -> str:
+    return entry["p"] + (f"?{entry['q']}" if "q" in entry else "")
+
+
+class LocalTarget:
+    """Fresh app instance with an empty database in a temporary directory"""
+
+    def __init__(self, config_file: str) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        database = os.path.join(self.tmpdir.name, "replay.db")
+
+        class ReplayConfig(Config):
+            CONFIG_FILE = config_file
+            DATABASE_FILE = database
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{database}"
+            SQLALCHEMY_BINDS = {"archive": f"sqlite:///{database}-archive"}
+            ARCHIVE_AFTER = None
+            TRAFFIC_LOG_FILE = None
+
+        self.app = create_app(ReplayConfig)
+        self.client = self.app.test_client(use_cookies=False)
+
+    def send(self, entry: dict) -> int:
+        headers = {"Cookie": cookie_header(entry["w"])} if "w" in entry else {}
+        response = self.client.open(request_target(entry), method=entry["m"], data=entry.get("f"), headers=headers)
+        return response.status_code
+
+
+class RemoteTarget:
+    """Running server reachable via http, e.g. gunicorn started with a fresh database"""
+
+    class NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args, **kwargs):  # noqa: ARG002
+            return None
+
+    def __init__(self, url: str) -> None:
+        self.url = url.rstrip("/")
+        self.opener = urllib.request.build_opener(RemoteTarget.NoRedirect)
+
+    def send(self, entry: dict) -> int:
+        data = urllib.parse.urlencode(entry["f"]).encode() if "f" in entry else None
+        req = urllib.request.Request(self.url + request_target(entry), data=data, method=entry["m"])  # noqa: S310
+        if "w" in entry:
+            req.add_header("Cookie", cookie_header(entry["w"]))
+
+        try:
+            with self.opener.open(req) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+def endpoint_name(app, entry: dict) -> str:
+    """Group requests by flask endpoint, e.g. all table submits are counted as service.service_table_submit"""
+    try:
+        endpoint, _ = app.url_map.bind("localhost").match(entry["p"], method=entry["m"])
+    except Exception:  # noqa: BLE001
+        endpoint = entry["p"]
+
+    return f"{entry['m']} {endpoint}"
+
+
+def replay(entries: list[dict], target, speed: float, workers: int) -> list[tuple[dict, float, float, int]]:
+    """Send all entries with the recorded spacing divided by speed (speed 0 = as fast as possible).
+    Returns (entry, latency, lag, status) for each request."""
+    if not entries:
+        return []
+
+    t0 = entries[0]["t"]
+    start = time.perf_counter()
+
+    def send(entry):
+        scheduled = (entry["t"] - t0) / speed if speed else 0.0
+        begin = time.perf_counter()
+        status = target.send(entry)
+        return entry, time.perf_counter() - begin, max(0.0, begin - start - scheduled), status
+
+    # The flask test client is not thread safe, only remote targets use multiple workers
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for entry in entries:
+            if speed and (delay := (entry["t"] - t0) / speed - (time.perf_counter() - start)) > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(send, entry))
+
+        return [f.result() for f in futures]
+
+
+def report(app, results: list[tuple[dict, float, float, int]]) -> None:
+    groups: dict[str, list[float]] = {}
+    for entry, latency, _, _ in results:
+        groups.setdefault(endpoint_name(app, entry), []).append(latency * 1000)
+
+    print(f"{'endpoint':<45} {'count':>6} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for name, latencies in sorted(groups.items()):
+        latencies.sort()
+        pct = [latencies[min(len(latencies) - 1, int(len(latencies) * q))] for q in (0.5, 0.95, 0.99)]
+        print(
+            f"{name:<45} {len(latencies):>6} {statistics.fmean(latencies):>8.2f} "
+            f"{pct[0]:>8.2f} {pct[1]:>8.2f} {pct[2]:>8.2f} {latencies[-1]:>8.2f}"
+        )
+
+    errors = sum(1 for *_, status in results if status >= 400)
+    max_lag = max(lag for _, _, lag, _ in results) * 1000
+    print(f"\n{len(results)} requests, {errors} errors, max schedule lag {max_lag:.2f}ms (latencies in ms)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("logfile", help="traffic log recorded with MINIPOS_TRAFFIC_LOG")
+    parser.add_argument("-s", "--speed", type=float, default=1.0, help="speedup factor, 0 = as fast as possible")
+    parser.add_argument("-u", "--url", help="replay against a running server instead of a fresh local instance")
+    parser.add_argument("-w", "--workers", type=int, default=8, help="parallel connections for --url")
+    parser.add_argument("-c", "--config", default="config.json", help="config file of the recorded event")
+    args = parser.parse_args()
+
+    entries = load_traffic(args.logfile)
+
+    # The local instance is also used to map paths to endpoint names for remote targets
+    local = LocalTarget(args.config)
+    target = RemoteTarget(args.url) if args.url else local
+    workers = args.workers if args.url else 1
+
+    print(f"Replaying {len(entries)} requests at {f'{args.speed}x' if args.speed else 'maximum'} speed...")
+    report(local.app, replay(entries, target, args.speed, workers))
+
+
+if __name__ == "__main__":
+    main()
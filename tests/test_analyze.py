@@ -0,0 +1,158 @@
+"""Test reading orders, the data cache and the figures of analyze.py"""
+
+import hashlib
+import logging
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+import analyze
+from analyze import read_orders
+from mini_pos import create_app
+from mini_pos.models import Order, db
+from mini_pos.settings import TestConfig
+
+OLD_SCHEMA = """
+    CREATE TABLE orders (id INTEGER NOT NULL PRIMARY KEY, nonce INTEGER, waiter VARCHAR, "table" VARCHAR,
+        date DATETIME, completed_at DATETIME);
+    CREATE TABLE products (id INTEGER NOT NULL PRIMARY KEY, order_id INTEGER, name VARCHAR, price FLOAT,
+        category VARCHAR, amount INTEGER, comment VARCHAR, completed BOOLEAN);
+    INSERT INTO orders VALUES (1, 1, 'Anna', 'A1', '2024-05-01 18:00:00.000000', '2024-05-01 18:05:00.000000');
+    INSERT INTO orders VALUES (2, 2, 'Bernd', 'B2', '2024-05-01 19:00:00.000000', NULL);
+    INSERT INTO products VALUES (1, 1, 'Altes Produkt', 2.5, 'Alt', 2, '', 1);
+    INSERT INTO products VALUES (2, 1, 'Anderes Produkt', 3.0, 'Alt', 1, 'kalt', 1);
+    INSERT INTO products VALUES (3, 2, 'Altes Produkt', 2.5, 'Alt', 1, '', 0);
+"""
+
+
+def add_orders(database, count, nonce=0):
+    """Submit and complete orders of different waiters and tables, spread over an evening"""
+
+    class FileConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{database}"
+
+    app = create_app(FileConfig)
+    client = app.test_client()
+    start = datetime(2024, 5, 1, 18)
+
+    for i in range(nonce, nonce + count):
+        client.set_cookie("waiter", ["Anna", "Bernd", "Clara"][i % 3])
+        data = {"nonce": str(i), "amount-1": str(i % 3 + 1), f"amount-{i % 7 + 2}": "1"}
+        client.post(f"/service/A{i % 5 + 1}", data=data)
+
+    with app.app_context():
+        for order in db.session.execute(db.select(Order).filter(Order.nonce >= nonce)).scalars():
+            order.date = start + timedelta(minutes=7 * order.nonce)
+            order.completed_at = order.date + timedelta(seconds=30 * (order.nonce % 5 + 1))
+            for product in order.products:
+                product.completed = True
+        db.session.commit()
+
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture()
+def database(tmp_path):
+    database = tmp_path / "data.db"
+    add_orders(database, 30)
+    return database
+
+
+@pytest.fixture()
+def old_database(tmp_path):
+    database = tmp_path / "old.db"
+    connection = sqlite3.connect(database)
+    connection.executescript(OLD_SCHEMA)
+    connection.close()
+    return database
+
+
+def test_read_old_database(old_database):
+    checksum = hashlib.sha256(old_database.read_bytes()).hexdigest()
+
+    dfo, dfp, dfr = read_orders(old_database, None)
+
+    assert dfo["orderid"].tolist() == [1]
+    assert dfo["price"].tolist() == [800]
+    assert sorted(zip(dfp["name"], dfp["price"], dfp["amount"])) == [
+        ("Altes Produkt", 250, 2),
+        ("Anderes Produkt", 300, 1),
+    ]
+    assert dfr.empty
+
+    # migrated in memory, the file is left as it was
+    assert hashlib.sha256(old_database.read_bytes()).hexdigest() == checksum
+    connection = sqlite3.connect(old_database)
+    assert connection.execute("PRAGMA user_version").fetchone()[0] == 0
+    connection.close()
+
+
+def test_read_database(database):
+    dfo, dfp, _ = read_orders(database, None)
+
+    assert len(dfo) == 30
+    assert dfo["waiter"].value_counts().to_dict() == {"Anna": 10, "Bernd": 10, "Clara": 10}
+    assert (dfo["completed_at"] > dfo["date"]).all()
+    assert dfp.groupby("orderid")["price"].count().eq(2).all()
+
+    # restricted to a time window
+    dfo, _, _ = read_orders(database, None, start=datetime(2024, 5, 1, 19), end=datetime(2024, 5, 1, 20))
+    assert len(dfo) == len([n for n in range(30) if 60 <= 7 * n < 120])
+
+
+def test_cache(database, tmp_path, caplog, monkeypatch):
+    caplog.set_level(logging.INFO, logger="analyze")
+    cache_dir = tmp_path / "cache"
+
+    def read():
+        caplog.clear()
+        dfo, dfp, _ = read_orders(database, cache_dir)
+        return sorted(dfo["orderid"]), len(dfp), caplog.text
+
+    complete = read_orders(database, None)
+    assert read()[:2] == (sorted(complete[0]["orderid"]), len(complete[1]))
+
+    # only new orders are read from the database
+    add_orders(database, 5, nonce=30)
+    orderids, products, log = read()
+    assert "newer than order 30" in log
+    assert (len(orderids), products) == (35, 70)
+
+    monkeypatch.setattr(analyze, "CACHE_VERSION", analyze.CACHE_VERSION + 1)
+    orderids, _, log = read()
+    assert "old format" in log
+    assert len(orderids) == 35
+
+    # a new database with the same name and more orders than the cache
+    database.unlink()
+    add_orders(database, 40, nonce=100)
+    orderids, products, log = read()
+    assert "changed since last run" in log
+    assert (len(orderids), products) == (40, 80)
+
+
+def test_parallel_figures(database, tmp_path, monkeypatch):
+    pypdf = pytest.importorskip("pypdf")
+    pytest.importorskip("matplotlib")
+    monkeypatch.setenv("MPLBACKEND", "Agg")
+
+    pages = {}
+    for workers in (1, 3):
+        output = tmp_path / f"workers-{workers}"
+        output.mkdir()
+        monkeypatch.chdir(output)
+        monkeypatch.setattr(sys, "argv", ["analyze.py", str(database), "--no-cache", "-j", str(workers)])
+        analyze.main()
+
+        reader = pypdf.PdfReader(output / analyze.PDF_FILENAME)
+        pages[workers] = [(list(page.mediabox), page.extract_text()) for page in reader.pages]
+
+    assert len(pages[1]) > 10
+    assert "Abgeschlossene Bestellungen: 30" in pages[1][0][1]
+    assert pages[1] == pages[3]
@@ -0,0 +1,56 @@
+"""Test archiving of completed orders"""
+
+from datetime import datetime, timedelta
+
+from mini_pos.models import ArchivedOrder, Order, archive_orders, db
+
+
+def submit_order(client, nonce, table="A1"):
+    client.post(f"/service/{table}", data={"nonce": str(nonce), "amount-1": "1", "comment-1": "", "amount-2": "2"})
+
+
+def test_archive(app):
+    client = app.test_client()
+
+    for nonce in range(1, 6):
+        submit_order(client, nonce)
+
+    with app.app_context():
+        order_ids = [o.id for o in Order.get_open_orders_by_table("A1")]
+
+    for order_id in order_ids[:4]:
+        client.post("/bar/default", data={"order-completed": str(order_id)})
+
+    with app.app_context():
+        assert archive_orders(datetime.now() + timedelta(minutes=1), batch_size=3) == 4
+
+        live = db.session.execute(db.select(Order.id)).scalars().all()
+        archived = db.session.execute(db.select(ArchivedOrder).order_by(ArchivedOrder.id)).scalars().all()
+
+        assert live == order_ids[4:]
+        assert [o.id for o in archived] == order_ids[:4]
+        assert [(p.name, p.amount) for p in archived[0].products] == [
+            (app.config["minipos"].products[1][0], 1),
+            (app.config["minipos"].products[2][0], 2),
+        ]
+
+        # history views read both databases
+        assert [o.id for o in Order.get_orders_by_table("A1")] == order_ids[::-1]
+        assert len(Order.get_all_completed_orders_for_bar("default")) == 4
+
+    assert client.get("/service/A1/history").status_code == 200
+    assert client.get("/bar/default/history").status_code == 200
+
+
+def test_archive_keeps_newest(app, runner):
+    client = app.test_client()
+    submit_order(client, 1)
+
+    with app.app_context():
+        order_id = Order.get_open_orders_by_table("A1")[0].id
+
+    client.post("/bar/default", data={"order-completed": str(order_id)})
+
+    # the newest order stays in the live database to keep ids unique
+    result = runner.invoke(args=["archive", "--older-than", "0"])
+    assert "Archived 0 orders" in result.output
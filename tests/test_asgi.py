@@ -0,0 +1,56 @@
+"""Test the asgi serving mode"""
+
+import asyncio
+
+from mini_pos.asgi import create_asgi_app
+
+
+def request(path: str) -> dict:
+    return {"type": "http", "method": "GET", "path": path, "query_string": b"", "http_version": "1.1", "headers": []}
+
+
+async def call(asgi, scope: dict, messages: int | None = None) -> list[dict]:
+    """Run a request and collect the sent messages. Streams are disconnected after the given number of messages"""
+    sent: list[dict] = []
+    done = asyncio.Event()
+
+    async def receive() -> dict:
+        if scope["path"].startswith("/push/"):
+            await done.wait()
+            return {"type": "http.disconnect"}
+        return {"type": "http.request", "body": b""}
+
+    async def send(message: dict) -> None:
+        sent.append(message)
+        if messages is not None and len(sent) >= messages:
+            done.set()
+
+    await asyncio.wait_for(asgi(scope, receive, send), 20)
+    return sent
+
+
+def test_asgi_wsgi(app):
+    asgi = create_asgi_app(app)
+    sent = asyncio.run(call(asgi, request("/fetch/service")))
+
+    assert sent[0]["type"] == "http.response.start"
+    assert sent[0]["status"] == 200
+    assert b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def test_asgi_push_bar(app):
+    asgi = create_asgi_app(app)
+    # response start and the first update
+    sent = asyncio.run(call(asgi, request("/push/bar/default"), messages=2))
+
+    assert sent[0]["status"] == 200
+    assert (b"content-type", b"text/event-stream") in sent[0]["headers"]
+    assert sent[1]["body"].startswith(b"event: config\ndata: ")
+    assert b"event: bar\ndata: " in sent[1]["body"]
+
+
+def test_asgi_push_unknown_bar(app):
+    asgi = create_asgi_app(app)
+    sent = asyncio.run(call(asgi, request("/push/bar/unknown")))
+
+    assert sent[0]["status"] == 404
@@ -0,0 +1,66 @@
+"""Test online database backups"""
+
+import sqlite3
+
+from mini_pos import create_app
+from mini_pos.backup import backup_all, backup_database, remove_old_backups
+from mini_pos.settings import TestConfig
+
+
+def test_backup_database(tmp_path):
+    source = tmp_path / "data.db"
+    with sqlite3.connect(source) as connection:
+        connection.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, name VARCHAR)")
+        connection.executemany("INSERT INTO orders (name) VALUES (?)", [(str(i) * 100,) for i in range(2000)])
+
+    target = tmp_path / "backup.db"
+    backup_database(str(source), str(target))
+
+    with sqlite3.connect(target) as connection:
+        assert connection.execute("SELECT count(*) FROM orders").fetchone()[0] == 2000
+    assert not (tmp_path / "backup.db.tmp").exists()
+
+
+def test_backup_during_write(tmp_path):
+    source = tmp_path / "data.db"
+    writer = sqlite3.connect(source, isolation_level=None)
+    writer.execute("PRAGMA journal_mode=WAL")
+    writer.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, name VARCHAR)")
+    writer.execute("INSERT INTO orders (name) VALUES ('committed')")
+
+    # an open write transaction neither blocks the backup nor ends up in it
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("INSERT INTO orders (name) VALUES ('pending')")
+
+    target = tmp_path / "backup.db"
+    (tmp_path / "backup.db.tmp").touch()  # left over by an interrupted backup
+    backup_database(str(source), str(target))
+    writer.execute("COMMIT")
+    writer.close()
+
+    with sqlite3.connect(target) as connection:
+        assert connection.execute("SELECT name FROM orders").fetchall() == [("committed",)]
+
+
+def test_remove_old_backups(tmp_path):
+    for stamp in ("20240101-120000", "20240101-130000", "20240102-090000"):
+        (tmp_path / f"data-{stamp}.db").touch()
+
+    remove_old_backups(str(tmp_path / "data-[0-9]*-[0-9]*.db"), keep=2)
+    assert sorted(x.name for x in tmp_path.iterdir()) == ["data-20240101-130000.db", "data-20240102-090000.db"]
+
+
+def test_backup_all(tmp_path):
+    class FileConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'data.db'}"
+        BACKUP_DIR = str(tmp_path / "backups")
+
+    app = create_app(FileConfig)
+    app.test_client().post("/service/A1", data={"nonce": "1", "amount-1": "1"})
+
+    with app.app_context():
+        backups = backup_all()
+
+    assert len(backups) == 1  # in-memory archive is skipped
+    with sqlite3.connect(backups[0]) as connection:
+        assert connection.execute("SELECT count(*) FROM orders").fetchone()[0] == 1
@@ -0,0 +1,46 @@
+"""Test the rendered response cache"""
+
+import threading
+import time
+
+from mini_pos.cache import ResponseCache
+
+
+def test_cache_stampede():
+    cache = ResponseCache()
+    calls = []
+
+    def render():
+        calls.append(1)
+        time.sleep(0.05)
+        return "body"
+
+    threads = [threading.Thread(target=cache.get, args=("bar/default", "1", render)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert cache.get("bar/default", "1", render) == "body"
+    assert cache.get("bar/default", "2", lambda: "new") == "new"
+
+
+def test_cache_shared(tmp_path):
+    first = ResponseCache(str(tmp_path / "cache.db"))
+    second = ResponseCache(str(tmp_path / "cache.db"))
+
+    assert first.get("bar/default", "1", lambda: "rendered by first") == "rendered by first"
+    assert second.get("bar/default", "1", lambda: "rendered by second") == "rendered by first"
+    assert second.get("bar/default", "2", lambda: "rendered by second") == "rendered by second"
+
+
+def test_fetch_bar_cached(client):
+    first = client.get("/fetch/bar/default")
+    assert client.get("/fetch/bar/default").headers["ETag"] == first.headers["ETag"]
+
+    client.post("/service/A1", data={"nonce": "1", "amount-1": "1"})
+
+    second = client.get("/fetch/bar/default")
+    assert second.headers["ETag"] != first.headers["ETag"]
+    assert second.data.count(b"order-timer") == 1
@@ -0,0 +1,71 @@
+"""Test catalog ids and migration of old databases"""
+
+import json
+import sqlite3
+from pathlib import Path
+
+from mini_pos import create_app
+from mini_pos.migrations import MIGRATIONS
+from mini_pos.models import Product, Stock, db
+from mini_pos.settings import TestConfig
+
+
+def make_config(tmp_path, database, config_data=None):
+    config_file = tmp_path / "config.json"
+    if config_data is None:
+        config_data = json.loads(Path("config.json").read_text(encoding="utf-8"))
+    config_file.write_text(json.dumps(config_data), encoding="utf-8")
+
+    class CatalogConfig(TestConfig):
+        CONFIG_FILE = str(config_file)
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{database}"
+
+    return CatalogConfig
+
+
+def test_stable_ids(tmp_path):
+    database = tmp_path / "data.db"
+    config_data = json.loads(Path("config.json").read_text(encoding="utf-8"))
+    products = create_app(make_config(tmp_path, database)).config["minipos"].products
+    ids = {name: pid for pid, (name, _, _) in products.items()}
+
+    # reorder the menu and add a product
+    config_data["products"] = dict(reversed(config_data["products"].items()))
+    config_data["products"]["Essen"].insert(0, ["Neu", 1.0])
+    app = create_app(make_config(tmp_path, database, config_data))
+
+    products = app.config["minipos"].products
+    assert all(products[pid][0] == name for name, pid in ids.items())
+    assert next(iter(products.values()))[0] == "Neu"  # config order is kept
+    assert {"Neu"} == {name for name, _, _ in products.values()} - set(ids)
+
+
+def test_migration(tmp_path):
+    database = tmp_path / "data.db"
+    connection = sqlite3.connect(database)
+    connection.executescript(
+        """
+        CREATE TABLE orders (id INTEGER NOT NULL PRIMARY KEY, nonce INTEGER, waiter VARCHAR, "table" VARCHAR,
+            date DATETIME, completed_at DATETIME);
+        CREATE TABLE products (id INTEGER NOT NULL PRIMARY KEY, order_id INTEGER, name VARCHAR, price FLOAT,
+            category VARCHAR, amount INTEGER, comment VARCHAR, completed BOOLEAN);
+        CREATE TABLE stock (name VARCHAR NOT NULL PRIMARY KEY, remaining INTEGER);
+        INSERT INTO orders VALUES (1, 1, 'Anna', 'A1', '2024-05-01 18:00:00.000000', NULL);
+        INSERT INTO products VALUES (1, 1, 'Altes Produkt', 2.5, 'Alt', 2, '', 0);
+        INSERT INTO products VALUES (2, 1, 'Altes Produkt', 3.0, 'Alt', 1, 'kalt', 0);
+        INSERT INTO stock VALUES ('Nie bestellt', 5);
+        """
+    )
+    connection.close()
+
+    app = create_app(make_config(tmp_path, database))
+
+    with app.app_context():
+        products = db.session.execute(db.select(Product).order_by(Product.id)).scalars().all()
+        assert [(p.name, p.category, p.price, p.comment) for p in products] == [
+            ("Altes Produkt", "Alt", 250, ""),
+            ("Altes Produkt", "Alt", 300, "kalt"),
+        ]
+        assert products[0].catalog_id == products[1].catalog_id
+        assert list(Stock.get_quotas().values()) == [5]
+        assert db.session.execute(db.text("PRAGMA user_version")).scalar_one() == len(MIGRATIONS)
@@ -0,0 +1,52 @@
+"""Test response compression and fingerprinted static files"""
+
+import gzip
+import shutil
+
+from mini_pos.assets import build_assets, init_assets, init_template_cache
+
+
+def test_compress_response(client):
+    for nonce in range(3):
+        client.post("/service/A1", data={"nonce": str(nonce), "amount-1": "1"})
+
+    plain = client.get("/fetch/bar/default")
+    compressed = client.get("/fetch/bar/default", headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in plain.headers
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.headers["ETag"] == f"W/{plain.headers['ETag']}"
+
+    # the weak etag of the compressed response still matches
+    response = client.get(
+        "/fetch/bar/default", headers={"Accept-Encoding": "gzip", "If-None-Match": compressed.headers["ETag"]}
+    )
+    assert response.status_code == 304
+
+
+def test_fingerprinted_assets(app, tmp_path):
+    static = tmp_path / "static"
+    shutil.copytree(app.static_folder, static, ignore=shutil.ignore_patterns("dist"))
+    app.static_folder = str(static)
+
+    manifest = build_assets(str(static))
+    init_assets(app)
+
+    client = app.test_client()
+    page = client.get("/bar/default").get_data(as_text=True)
+    assert f"/static/dist/{manifest['js/bar.js']}" in page
+
+    response = client.get(f"/static/dist/{manifest['js/bar.js']}", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert gzip.decompress(response.data) == (static / "js" / "bar.js").read_bytes()
+    response.close()
+
+
+def test_template_cache(app, tmp_path):
+    app.config["TEMPLATE_CACHE_DIR"] = str(tmp_path)
+    init_template_cache(app)
+
+    app.jinja_env.get_template("bar_body.html")
+    assert list(tmp_path.glob("__jinja2_*.cache"))
@@ -0,0 +1,34 @@
+"""Test the audit event log"""
+
+from mini_pos.models import Event, Product, db
+
+
+def test_events(app):
+    client = app.test_client()
+
+    products = app.config["minipos"].products
+    drink, food = 1, len(products)
+
+    data = {"nonce": "1", f"amount-{drink}": "1", f"comment-{drink}": "", f"amount-{food}": "1", f"comment-{food}": ""}
+    client.post("/service/A1", data=data)
+
+    with app.app_context():
+        drink_id, food_id = db.session.execute(db.select(Product.id).order_by(Product.id)).scalars().all()
+
+    client.post("/bar/Getränke", data={"product-completed": str(drink_id)})
+    client.post("/bar/Küche", data={"product-completed": str(food_id)})  # auto close
+
+    response = client.get("/fetch/events")
+    assert [(e["kind"], e["product_id"], e["bar"]) for e in response.json["events"]] == [
+        (Event.ORDER_CREATED, None, None),
+        (Event.PRODUCT_COMPLETED, drink_id, "Getränke"),
+        (Event.PRODUCT_COMPLETED, food_id, "Küche"),
+        (Event.ORDER_COMPLETED, None, "Küche"),
+    ]
+    assert response.json["seq"] == 4
+
+    response = client.get("/fetch/events?since=2")
+    assert [e["seq"] for e in response.json["events"]] == [3, 4]
+
+    assert client.get("/fetch/events?since=4").json == {"seq": 4, "more": False, "events": []}
+    assert client.get("/fetch/events?since=x").data == b"Error! Invalid since parameter"
@@ -0,0 +1,58 @@
+"""Test the csv and parquet export"""
+
+import csv
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+AUTH = {"Authorization": "Basic OmFkbWlu"}  # empty user, password admin
+
+
+def order(client, nonce):
+    client.post("/service/A1", data={"nonce": str(nonce), "amount-1": "2", "comment-1": "kalt", "amount-2": "1"})
+
+
+def test_export_csv(app, client):
+    order(client, 1)
+    order(client, 2)
+
+    response = client.get("/admin/export/products", headers=AUTH)
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert len(rows) == 4
+    assert rows[0]["name"] == app.config["minipos"].products[1][0]
+    assert (rows[0]["amount"], rows[0]["comment"], rows[0]["order_id"]) == ("2", "kalt", "1")
+
+    rows = list(csv.DictReader(io.StringIO(client.get("/admin/export/orders", headers=AUTH).get_data(as_text=True))))
+    assert [(r["order_id"], r["items"]) for r in rows] == [("1", "3"), ("2", "3")]
+
+
+def test_export_filter(client):
+    order(client, 1)
+
+    tomorrow = (datetime.now() + timedelta(days=1)).isoformat()
+    response = client.get(f"/admin/export/orders?from={tomorrow}", headers=AUTH)
+    assert response.get_data(as_text=True).splitlines() == ["order_id,date,completed_at,waiter,table,items,total"]
+
+    assert client.get("/admin/export/orders?from=yesterday", headers=AUTH).status_code == 400
+    assert client.get("/admin/export/orders").status_code == 401
+
+
+def test_export_parquet(app, runner, tmp_path, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr("mini_pos.export.EXPORT_CHUNK_SIZE", 4)
+
+    client = app.test_client()
+    for nonce in range(3):  # 6 products, more than one chunk
+        order(client, nonce)
+
+    output = tmp_path / "products.parquet"
+    result = runner.invoke(args=["export", "products", "--format", "parquet", "-o", str(output)])
+    assert result.exit_code == 0
+
+    parquet = pq.ParquetFile(output)
+    assert parquet.metadata.num_rows == 6
+    assert parquet.metadata.num_row_groups == 2
@@ -0,0 +1,28 @@
+"""Test logging setup"""
+
+import json
+import logging
+
+from mini_pos.log import JsonFormatter, SamplingFilter
+
+
+def make_record(level, msg):
+    return logging.LogRecord("mini_pos", level, __file__, 1, msg, ("x",), None)
+
+
+def test_queue_handler(app):
+    assert [x.name for x in app.logger.handlers] == ["QueueHandler", "CritLogCountHandler"]
+
+
+def test_sampling():
+    sampling = SamplingFilter({"mini_pos": 3})
+
+    assert [sampling.filter(make_record(logging.DEBUG, "fetch %s")) for _ in range(6)] == [True, False, False] * 2
+    assert sampling.filter(make_record(logging.DEBUG, "other %s"))
+    assert all(sampling.filter(make_record(logging.INFO, "fetch %s")) for _ in range(3))
+
+
+def test_json_format():
+    entry = json.loads(JsonFormatter().format(make_record(logging.WARNING, "Skipping %s...")))
+    assert entry["level"] == "WARNING"
+    assert entry["message"] == "Skipping x..."
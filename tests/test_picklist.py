@@ -0,0 +1,72 @@
+"""Test the pick list of a bar"""
+
+import json
+from pathlib import Path
+
+from mini_pos import create_app
+from mini_pos.config import reload_config
+from mini_pos.models import Product, db
+from mini_pos.settings import TestConfig
+
+
+def test_picklist(app):
+    client = app.test_client()
+
+    products = app.config["minipos"].products
+    drink, food = 1, len(products)
+
+    client.post("/service/A1", data={"nonce": "1", f"amount-{drink}": "2", f"comment-{drink}": "kalt"})
+    client.post("/service/A2", data={"nonce": "2", f"amount-{drink}": "3", f"amount-{food}": "1"})
+
+    response = client.get("/fetch/picklist/Getränke")
+    assert response.json == [{"catalog_id": drink, "name": products[drink][0], "amount": 5, "comments": {"kalt": 2}}]
+    assert [item["catalog_id"] for item in client.get("/fetch/picklist/default").json] == [drink, food]
+
+    with app.app_context():
+        product_id = db.session.execute(db.select(Product.id).filter_by(comment="kalt")).scalar_one()
+
+    # completing a product changes the cached list
+    client.post("/bar/Getränke", data={"product-completed": str(product_id)})
+    assert client.get("/fetch/picklist/Getränke").json[0]["amount"] == 3
+
+    assert "3x" in client.get("/bar/Getränke/picklist").get_data(as_text=True)
+    assert client.get("/fetch/picklist/invalid").get_data(as_text=True) == "Error! Bar not found"
+
+
+def test_picklist_index(app):
+    with app.app_context():
+        plan = db.session.execute(
+            db.text(
+                "EXPLAIN QUERY PLAN SELECT catalog_id, sum(amount), comment FROM products "
+                "WHERE completed = 0 AND catalog_id IN (1, 2) GROUP BY catalog_id, comment"
+            )
+        ).all()
+
+    assert "COVERING INDEX ix_products_open" in " ".join(row[-1] for row in plan)
+
+
+def test_picklist_removed_product(tmp_path):
+    config_file = tmp_path / "config.json"
+    config_data = json.loads(Path("config.json").read_text(encoding="utf-8"))
+    config_file.write_text(json.dumps(config_data), encoding="utf-8")
+
+    class FileConfig(TestConfig):
+        CONFIG_FILE = str(config_file)
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'data.db'}"
+
+    app = create_app(FileConfig)
+    client = app.test_client()
+    name = app.config["minipos"].products[1][0]
+    client.post("/service/A1", data={"nonce": "1", "amount-1": "2"})
+
+    # the product is removed while the order is still open
+    config_data["products"]["Alkoholfrei"] = config_data["products"]["Alkoholfrei"][1:]
+    config_file.write_text(json.dumps(config_data), encoding="utf-8")
+    with app.app_context():
+        assert reload_config(app) is not None
+    assert 1 not in app.config["minipos"].products
+
+    response = client.get("/fetch/picklist/Getränke")
+    assert response.status_code == 200
+    assert response.json[0] == {"catalog_id": 1, "name": name, "amount": 2, "comments": {}}
+    assert client.get("/bar/Getränke/picklist").status_code == 200
@@ -0,0 +1,49 @@
+"""Test the print queue"""
+
+import socket
+
+from mini_pos.models import PrintJob, db
+from mini_pos.printing import drain
+
+
+def order(client, nonce):
+    return client.post("/service/A1", data={"nonce": str(nonce), "amount-1": "2", "comment-1": "kalt"})
+
+
+def test_print_file(app, tmp_path):
+    bons = tmp_path / "bons.txt"
+    app.config["minipos"].printers = {"Getränke": f"file://{bons}", "Küche": f"file://{tmp_path / 'kitchen.txt'}"}
+    name = app.config["minipos"].products[1][0]
+
+    order(app.test_client(), 1)
+
+    with app.app_context():
+        # product 1 is a drink, nothing for the kitchen
+        assert db.session.execute(db.select(PrintJob.printer)).scalars().all() == ["Getränke"]
+
+    assert drain(app, "Getränke") == 1
+    assert f"2x {name} (kalt)" in bons.read_text(encoding="utf-8")
+    assert drain(app, "Getränke") == 0
+
+    with app.app_context():
+        assert PrintJob.count_by_status("Getränke") == {PrintJob.DONE: 1}
+
+
+def test_print_retry(app):
+    # reserve a port nobody listens on
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    app.config["minipos"].printers = {"Getränke": f"tcp://127.0.0.1:{port}"}
+
+    order(app.test_client(), 1)
+
+    assert drain(app, "Getränke") == 1
+    assert drain(app, "Getränke") == 0  # retry is delayed
+
+    with app.app_context():
+        job = db.session.execute(db.select(PrintJob)).scalar_one()
+        assert job.status == PrintJob.PENDING
+        assert job.attempts == 1
+        assert job.error is not None
@@ -0,0 +1,26 @@
+"""Test traffic recording"""
+
+from mini_pos import create_app
+from mini_pos.recorder import load_traffic
+from mini_pos.settings import TestConfig
+
+
+def test_record_traffic(tmp_path):
+    logfile = tmp_path / "traffic.log"
+
+    class RecordConfig(TestConfig):
+        TRAFFIC_LOG_FILE = str(logfile)
+
+    client = create_app(RecordConfig).test_client()
+    client.set_cookie("waiter", "Anna")
+
+    client.post("/service/A1", data={"nonce": "1", "amount-1": "2", "comment-1": ""})
+    client.get("/fetch/bar/default")
+    client.get("/static/css/bar.css")  # static files are not recorded
+
+    entries = load_traffic(str(logfile))
+
+    assert [(e["m"], e["p"]) for e in entries] == [("POST", "/service/A1"), ("GET", "/fetch/bar/default")]
+    assert entries[0]["f"] == {"nonce": "1", "amount-1": "2", "comment-1": ""}
+    assert entries[0]["w"] == "Anna"
+    assert "f" not in entries[1]
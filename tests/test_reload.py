@@ -0,0 +1,116 @@
+"""Test config reload across workers"""
+
+import copy
+import json
+from base64 import b64encode
+from pathlib import Path
+
+import pytest
+
+from mini_pos import config, create_app
+from mini_pos.models import ConfigRevision, Product, db
+from mini_pos.printing import PrintWorker
+from mini_pos.settings import TestConfig
+
+AUTH = {"Authorization": "Basic " + b64encode(b"admin:admin").decode()}
+
+
+@pytest.fixture()
+def workers(tmp_path, monkeypatch):
+    """Two apps sharing one database like gunicorn workers"""
+    config_file = tmp_path / "config.json"
+    config_file.write_text(Path("config.json").read_text(encoding="utf-8"), encoding="utf-8")
+    monkeypatch.setattr(config, "CONFIG_CHECK_INTERVAL", 0)
+
+    class ReloadConfig(TestConfig):
+        CONFIG_FILE = str(config_file)
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'data.db'}"
+
+    return config_file, create_app(ReloadConfig), create_app(ReloadConfig)
+
+
+def test_reload(workers):
+    config_file, app1, app2 = workers
+    version = app1.extensions["minipos_config"]["version"]
+    assert app2.extensions["minipos_config"]["version"] == version  # same config, no new revision
+
+    config_data = json.loads(config_file.read_text(encoding="utf-8"))
+    config_data["products"]["Essen"].append(["Neu", 1.5])
+    config_file.write_text(json.dumps(config_data), encoding="utf-8")
+
+    assert app1.test_client().post("/admin/config", headers=AUTH).status_code == 302
+    assert app1.config["minipos"].products[len(app1.config["minipos"].products)] == ("Neu", 150, "Essen")
+
+    response = app2.test_client().get("/service")
+    assert response.headers["X-Config-Version"] == str(version + 1)
+    assert app2.config["minipos"].products[len(app2.config["minipos"].products)][0] == "Neu"
+
+    # forms rendered with the old config are rejected, product ids may have changed
+    response = app2.test_client().post("/service/A1", data={"nonce": "1", "config-version": str(version)})
+    assert response.data == b"Error! Config changed, please reload the page"
+
+
+def test_reload_invalid(workers):
+    config_file, app1, _ = workers
+    config_file.write_text("{", encoding="utf-8")
+
+    response = app1.test_client().post("/admin/config", headers=AUTH)
+    assert response.data == b"Error! Invalid config file, see log for details"
+    assert app1.extensions["minipos_config"]["version"] == 1
+
+
+def test_reload_during_order(app):
+    """A config swapped by another thread while an order is submitted does not affect the order"""
+    current = app.config["minipos"]
+    swapped = copy.copy(current)
+    swapped.products = {}  # e.g. all products removed
+
+    class SwappingProducts(dict):
+        def __iter__(self):
+            app.config["minipos"] = swapped
+            return super().__iter__()
+
+    current.products = SwappingProducts(current.products)
+    response = app.test_client().post("/service/A1", data={"nonce": "1", "amount-1": "2"})
+
+    assert response.status_code == 200
+    with app.app_context():
+        assert [(p.catalog_id, p.amount) for p in Product.get_open_products_by_order_id(1)] == [(1, 2)]
+
+
+def test_invalid_revision(workers, monkeypatch):
+    """An invalid revision published by another worker is parsed once and the current config is kept"""
+    _, app1, app2 = workers
+
+    with app1.app_context():
+        invalid = ConfigRevision.add(json.dumps({"products": []}))
+        db.session.commit()
+
+    parsed = []
+    monkeypatch.setattr(config, "parse_config", lambda data: parsed.append(data) or (None, 1))
+
+    client = app2.test_client()
+    for _ in range(2):
+        assert client.get("/service").status_code == 200
+
+    assert len(parsed) == 1
+    assert app2.extensions["minipos_config"]["seen"] == invalid
+    assert app2.extensions["minipos_config"]["version"] == invalid - 1
+
+
+def test_reload_printer(workers, tmp_path, monkeypatch):
+    """Printers added by a reload get a print worker in every worker process"""
+    config_file, app1, app2 = workers
+    monkeypatch.setattr(PrintWorker, "start", lambda _: None)
+    for app in (app1, app2):
+        app.extensions["minipos_printing"] = {}  # printing is not started in tests
+
+    config_data = json.loads(config_file.read_text(encoding="utf-8"))
+    config_data["printers"] = {"Getränke": f"file://{tmp_path / 'bons.txt'}"}
+    config_file.write_text(json.dumps(config_data), encoding="utf-8")
+
+    app1.test_client().post("/admin/config", headers=AUTH)
+    app2.test_client().get("/service")
+
+    assert list(app1.extensions["minipos_printing"]) == ["Getränke"]
+    assert list(app2.extensions["minipos_printing"]) == ["Getränke"]
@@ -1,5 +1,7 @@
 """Check for broken routes"""
 
+from mini_pos.routes import fetch
+
 
 def test_index(client):
     response = client.get("/")
@@ -60,6 +62,21 @@ def test_fetch_bar(client):
     assert b"server-status-up" in response.data
 
 
+def test_fetch_bar_etag(client, monkeypatch):
+    client.post("/service/A1", data={"nonce": "1", "amount-1": "1"})
+
+    first = client.get("/fetch/bar/default")
+    second = client.get("/fetch/bar/default")
+    assert first.data == second.data  # timers are computed by the client
+    assert b"data-created=" in first.data
+
+    # the body is not rendered for a screen which is up to date
+    monkeypatch.setattr(fetch, "render_bar_body", None)
+    response = client.get("/fetch/bar/default", headers={"If-None-Match": first.headers["ETag"]})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == first.headers["ETag"]
+
+
 def test_fetch_service(client):
     response = client.get("/fetch/service")
     assert b"[]" in response.data
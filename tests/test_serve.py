@@ -0,0 +1,50 @@
+"""Test the production server setup"""
+
+import argparse
+
+import pytest
+
+from mini_pos import create_app
+from mini_pos.models import db
+from mini_pos.serve import Server, default_threads, default_workers, post_fork, server_options, warm_up
+from mini_pos.settings import TestConfig
+
+
+@pytest.fixture()
+def file_app(tmp_path):
+    # connections are closed before forking, in-memory databases would be lost
+    class FileConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'data.db'}"
+        SQLALCHEMY_BINDS = {"archive": f"sqlite:///{tmp_path / 'data-archive.db'}"}
+
+    return create_app(FileConfig, background=False)
+
+
+def test_sqlite_pragmas(file_app):
+    with file_app.app_context():
+        assert db.session.execute(db.text("PRAGMA journal_mode")).scalar_one() == "wal"
+        assert db.session.execute(db.text("PRAGMA synchronous")).scalar_one() == 1  # NORMAL
+        assert db.session.execute(db.text("PRAGMA busy_timeout")).scalar_one() == 5000
+
+
+def test_server_options():
+    args = argparse.Namespace(bind="127.0.0.1:8000", workers=default_workers(), threads=default_threads())
+    server = Server(create_app(TestConfig, background=False), server_options(args))
+
+    assert server.cfg.workers == args.workers >= 3
+    assert server.cfg.threads == args.threads >= 2
+    assert server.cfg.preload_app
+    assert callable(server.cfg.post_fork)
+
+
+def test_warm_up_and_post_fork(file_app):
+    warm_up(file_app)
+    assert file_app.extensions["minipos_response_cache"].entries
+
+    listener = next(x for x in file_app.logger.handlers if x.name == "QueueHandler").listener
+    post_fork(file_app, None, None)
+    restarted = next(x for x in file_app.logger.handlers if x.name == "QueueHandler").listener
+
+    assert restarted is not listener
+    assert restarted._thread.is_alive()  # noqa: SLF001
+    assert file_app.test_client().get("/fetch/bar/default").status_code == 200
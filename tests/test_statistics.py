@@ -0,0 +1,72 @@
+"""Test live statistics"""
+
+from mini_pos.models import Order, Statistic
+
+
+def get_statistic(kind, key):
+    return next((s for s in Statistic.get_statistics(kind) if s.key == key), None)
+
+
+def test_statistics_counters(app):
+    client = app.test_client()
+    client.set_cookie("waiter", "Anna")
+
+    products = app.config["minipos"].products
+    drink, food = 1, len(products)  # first product is a drink, last product is food
+
+    data = {"nonce": "1", f"amount-{drink}": "2", f"comment-{drink}": "", f"amount-{food}": "1", f"comment-{food}": ""}
+    client.post("/service/A1", data=data)
+
+    revenue = 2 * products[drink][1] + products[food][1]
+
+    with app.app_context():
+        table = get_statistic("table", "A1")
+        assert (table.orders, table.items, table.revenue, table.completed) == (1, 3, revenue, 0)
+
+        waiter = get_statistic("waiter", "Anna")
+        assert (waiter.orders, waiter.items, waiter.revenue) == (1, 3, revenue)
+
+        assert get_statistic("product", products[drink][0]).items == 2
+        assert get_statistic("bar", "Getränke").items == 2
+        assert get_statistic("bar", "Küche").items == 1
+        assert get_statistic("bar", "default").items == 3
+
+        order = Order.get_open_orders_for_bar("default")[0]
+
+    client.post("/bar/default", data={"order-completed": str(order.id)})
+
+    with app.app_context():
+        assert get_statistic("table", "A1").completed == 1
+        assert get_statistic("waiter", "Anna").average_completion_time is not None
+        assert get_statistic("bar", "default").completed == 2  # two products completed
+
+
+def test_fetch_statistics(client):
+    client.post("/service/B2", data={"nonce": "2", "amount-1": "1", "comment-1": ""})
+
+    response = client.get("/fetch/statistics/table")
+    assert response.json[0]["key"] == "B2"
+    assert response.json[0]["orders"] == 1
+
+
+def test_statistics_routes(client):
+    assert b"<title>Statistics</title>" in client.get("/statistics").data
+    assert b"<title>Statistics</title>" in client.get("/statistics/by-waiter").data
+    assert b"Error" in client.get("/statistics/by-nothing").data
+
+
+def test_rollups(client):
+    client.post("/service/C3", data={"nonce": "3", "amount-1": "2", "comment-1": ""})
+    client.post("/service/C4", data={"nonce": "4", "amount-1": "1", "comment-1": ""})
+
+    response = client.get("/fetch/rollups")
+    columns, rows = response.json["columns"], response.json["rows"]
+
+    assert sum(row[columns.index("orders")] for row in rows) == 2
+    assert sum(row[columns.index("items")] for row in rows) == 3
+
+    response = client.get("/fetch/rollups/Küche")
+    assert response.json["rows"] == []
+
+    assert client.get("/fetch/rollups?since=2000-01-01T00:00").json["rows"]
+    assert b"Error" in client.get("/fetch/rollups?since=yesterday").data
@@ -0,0 +1,59 @@
+"""Test quotas and sold out products"""
+
+from base64 import b64encode
+
+from mini_pos.models import Order, Stock, db
+
+AUTH = {"Authorization": "Basic " + b64encode(b"admin:admin").decode()}
+
+
+def order(client, nonce, amount):
+    return client.post("/service/A1", data={"nonce": str(nonce), "amount-1": str(amount), "comment-1": ""})
+
+
+def test_admin_auth(client):
+    assert client.get("/admin/stock").status_code == 401
+    assert client.get("/admin/stock", headers=AUTH).status_code == 200
+
+
+def test_quota(app):
+    client = app.test_client()
+    name = app.config["minipos"].products[1][0]
+    pid = 1
+
+    response = client.post("/admin/stock", data={"quota-1": "3", "quota-2": ""}, headers=AUTH)
+    assert response.status_code == 302
+
+    with app.app_context():
+        assert Stock.get_quotas() == {pid: 3}
+        assert pid not in Stock.get_sold_out()
+
+    order(client, 1, 2)
+    response = order(client, 2, 2)  # only one left
+    assert f"{name} is sold out".encode() in response.data
+
+    order(client, 3, 1)
+
+    with app.app_context():
+        assert len(Order.get_open_orders_by_table("A1")) == 2
+        assert Stock.get_quota(pid) == 0
+        assert pid in Stock.get_sold_out()
+
+    assert b"sold-out" in client.get("/service/A1").data
+
+    # Remove quota
+    client.post("/admin/stock", data={"quota-1": ""}, headers=AUTH)
+
+    with app.app_context():
+        assert Stock.get_quota(pid) is None
+        assert pid not in Stock.get_sold_out()
+
+
+def test_take_unlimited(app):
+    with app.app_context():
+        assert Stock.take(1, 100)
+
+        Stock.set_quota(2, 1)
+        assert not Stock.take(2, 2)
+        assert Stock.take(2, 1)
+        db.session.rollback()
@@ -0,0 +1,93 @@
+"""Test the single writer mode"""
+
+import threading
+
+import pytest
+
+from mini_pos import create_app
+from mini_pos.models import Order, Stock, db
+from mini_pos.settings import TestConfig
+
+
+class FakeConnection:
+    def __init__(self) -> None:
+        self.results: list = []
+
+    def send(self, result) -> None:
+        self.results.append(result)
+
+
+@pytest.fixture()
+def queue_app(tmp_path):
+    class QueueConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'data.db'}"
+        WRITE_MODE = "queue"
+        WRITER_SOCKET = str(tmp_path / "writer.sock")
+
+    return create_app(QueueConfig)
+
+
+def test_queue_orders(queue_app):
+    assert queue_app.extensions["minipos_writer"]["writer"] is not None
+
+    def submit(nonces):
+        client = queue_app.test_client()
+        for nonce in nonces:
+            client.post("/service/A1", data={"nonce": str(nonce), "amount-1": "1", "amount-2": "2"})
+
+    threads = [threading.Thread(target=submit, args=(range(i * 10, i * 10 + 10),)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with queue_app.app_context():
+        assert len(Order.get_open_order_nonces()) == 40
+        order_id = db.session.execute(db.select(Order.id).filter_by(nonce=5)).scalar_one()
+
+    queue_app.test_client().post("/bar/default", data={"order-completed": str(order_id)})
+
+    with queue_app.app_context():
+        assert Order.get_order_by_id(order_id).completed_at is not None
+
+
+def test_group_commit(queue_app):
+    with queue_app.app_context():
+        Stock.set_quota(1, 1)
+        db.session.commit()
+
+    # only the first order gets the last item, the others are rolled back without affecting it
+    connection = FakeConnection()
+    group = [(connection, "create_order", ("", "A1", nonce, [(1, 250, 1, "")])) for nonce in range(3)]
+    queue_app.extensions["minipos_writer"]["writer"].commit(group)
+
+    assert [status for status, _ in connection.results] == ["ok", "rejected", "rejected"]
+
+    with queue_app.app_context():
+        assert Order.get_open_order_nonces() == [0]
+        assert Stock.get_quota(1) == 0
+
+    response = queue_app.test_client().post("/service/A1", data={"nonce": "7", "amount-1": "1"})
+    assert response.get_data(as_text=True).endswith("is sold out")
+
+
+def test_bar_write_timeout(queue_app, monkeypatch):
+    client = queue_app.test_client()
+    client.post("/service/A1", data={"nonce": "1", "amount-1": "1"})
+
+    with queue_app.app_context():
+        order_id = db.session.execute(db.select(Order.id).filter_by(nonce=1)).scalar_one()
+
+    def timeout(name, args):  # noqa: ARG001
+        msg = "No response of writer"
+        raise TimeoutError(msg)
+
+    monkeypatch.setattr("mini_pos.writer.send", timeout)
+    response = client.post("/bar/default", data={"order-completed": str(order_id)})
+
+    assert response.status_code == 200
+    assert response.get_data(as_text=True) == "Error! Database busy, please try again"
+    assert response.headers["Refresh"] == "3; url=/bar/default"
+
+    with queue_app.app_context():
+        assert Order.get_order_by_id(order_id).completed_at is None